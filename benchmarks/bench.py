@@ -0,0 +1,357 @@
+#! /usr/bin/python2
+
+"""Brain Requirement Just A Formality benchmarks.
+
+Usage: bench.py [-o OUT] [-c BASELINE] [-t THRESHOLD] [-r REPEAT] [NAME...]
+
+Run the benchmarks whose names start with any of the given NAMEs (all by
+default) and print the results.  Rendering is done headless, using SDL's dummy
+video driver, and settings are not read from the user's settings file.
+
+-o OUT: save results to the file OUT as JSON.
+-c BASELINE: compare results to those saved in the file BASELINE, and exit
+             with status 1 if any are slower by more than the threshold, or
+             failed where they succeeded before.
+-t THRESHOLD: allowed slowdown when comparing, as a fraction (default 0.1).
+-r REPEAT: number of times to run each benchmark (default 5); the best time
+           is compared, and the median is also recorded.
+
+Each benchmark has a fixed workload, and anything random uses a fixed seed, so
+results can be compared between releases on the same machine.
+
+The parallel solver is run with different numbers of workers, and its speedup
+over one worker is printed and saved with the results.
+
+"""
+
+import sys
+import os
+import platform
+import random
+import json
+from time import time, strftime
+from getopt import getopt, GetoptError
+from tempfile import mkdtemp
+from shutil import rmtree
+from multiprocessing import cpu_count
+
+# headless, and ignore the user's settings
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+TMP = os.environ['HOME'] = os.environ['APPDATA'] = mkdtemp()
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+import imp
+import pygame
+# this initialises pygame; loading it would write bytecode to 'runc' in the
+# source tree
+sys.dont_write_bytecode = True
+run = imp.load_source('run', os.path.join(ROOT, 'run'))
+sys.dont_write_bytecode = False
+from brjaf import conf
+from brjaf.ext import evthandler as eh
+from brjaf.ext.fonthandler import Fonts
+from brjaf.puzzle import Puzzle, compress_lvl, decompress_lvl
+from brjaf.level import Level
+from brjaf.menu import MainMenu, get_levels
+from brjaf.solver import ParallelSolver
+
+SEED = 0
+RES = (800, 600)
+LEVELS = get_levels(0)
+TEXT = ' '.join(['Brain requirement just a formality.'] * 20)
+# level to solve with different numbers of workers
+SOLVE_LEVEL = '05'
+WORKERS = sorted(set((1, 2, 4, cpu_count())))
+
+class Idle (object):
+    """Backend that does nothing, used to create a Game."""
+
+    def __init__ (self, game, event_handler):
+        self.event_handler = event_handler
+        self.FRAME = conf.FRAME
+
+    def update (self):
+        pass
+
+    def draw (self, screen):
+        return False
+
+
+def defn (lvl):
+    """Get the definition of a level in lvl/."""
+    with open(conf.LEVEL_DIR_MAIN + lvl) as f:
+        return f.read()
+
+def synthetic (w, h, density = .3, arrows = .1, seed = SEED):
+    """Generate a level definition with lots of blocks.
+
+synthetic(w, h, density = .3, arrows = .1, seed = SEED) -> defn
+
+w, h: level size.
+density: proportion of tiles with a (non-player) block.
+arrows: proportion of tiles with an arrow surface.
+seed: random seed.
+
+"""
+    r = random.Random(seed)
+    tiles = [(x, y) for x in xrange(w) for y in xrange(h)]
+    r.shuffle(tiles)
+    n_b = int(len(tiles) * density)
+    bs = [(conf.B_PLAYER,) + tiles[0]]
+    bs += [(r.choice((conf.B_STANDARD, conf.B_STANDARD, conf.B_SLIDE,
+                      conf.B_BOUNCE, conf.B_IMMOVEABLE)),) + t
+           for t in tiles[1:n_b]]
+    r.shuffle(tiles)
+    ss = [(r.choice(conf.S_ARROWS),) + t
+          for t in tiles[:int(len(tiles) * arrows)]]
+    ss += [(conf.B_STANDARD,) + t for t in tiles[-n_b / 4:]]
+    lines = ['{0} {1}'.format(w, h)]
+    lines += ['{0} {1} {2}'.format(*b) for b in bs]
+    lines.append('')
+    lines += ['{0} {1} {2}'.format(*s) for s in ss]
+    return '\n'.join(lines)
+
+def new_puzzle (game, defn, physics = True):
+    """Create a puzzle with a fixed random seed."""
+    return Puzzle(game, defn, physics, seed = SEED)
+
+
+# benchmarks: each is a function taking the Game instance and returning a
+# (setup, op) tuple, where setup is called before each run (untimed) and op is
+# timed
+
+def step (size):
+    def bench (game):
+        d = synthetic(size, size)
+        p = [None]
+        def setup ():
+            p[0] = new_puzzle(game, d)
+        def op ():
+            step = p[0].step
+            for i in xrange(50):
+                step()
+        return setup, op
+    return bench
+
+def replay (lvl):
+    def bench (game):
+        d = defn(lvl)
+        def op ():
+            l = Level(definition = d, sound = False, seed = SEED)
+            # solutions are short, so go through them a few times
+            for i in range(len(l.solutions)) * 10:
+                l.solve(i)
+                while l.solving:
+                    l.update()
+                wait = conf.POST_SOLVE_WAIT
+                while wait and l.update():
+                    wait -= 1
+                # a faster replay is no good if it doesn't work any more
+                assert l.won, 'solution {0} doesn\'t win'.format(i)
+        return None, op
+    return bench
+
+def draw (partial):
+    def bench (game):
+        p = new_puzzle(game, synthetic(20, 15))
+        screen = game.screen
+        r = random.Random(SEED)
+        tiles = [(x, y) for x in xrange(p.w) for y in xrange(p.h)]
+        # draw once so images are cached
+        p.draw(screen, True)
+        def op ():
+            for i in xrange(10):
+                if partial:
+                    p.tiler.change(*r.sample(tiles, len(tiles) / 10))
+                    p.draw(screen)
+                else:
+                    p.draw(screen, True)
+        return None, op
+    return bench
+
+def tile_sizes (game):
+    p = new_puzzle(game, synthetic(20, 15))
+    t = p.tiler
+    sizes = [(w, h) for w in xrange(320, 1600, 40)
+                    for h in xrange(240, 1200, 40)]
+    def op ():
+        for size in sizes:
+            t._tile_sizes(size, (0, 0) + size)
+    return None, op
+
+def fonts_text (game):
+    font = (conf.MSG_FONT[conf.THEME], 20, False)
+    colour = conf.MSG_TEXT_COLOUR[conf.THEME]
+    fonts = [None]
+    def setup ():
+        # new instance, so that fonts are loaded again
+        fonts[0] = Fonts(conf.FONT_DIR)
+    def op ():
+        for w in xrange(200, 800, 50):
+            fonts[0].text(font, TEXT, colour, None, w, 1, True)
+    return setup, op
+
+def codec (version):
+    def bench (game):
+        # compress_lvl takes custom levels, so copy levels there
+        d = conf.LEVEL_DIR_CUSTOM
+        if not os.path.exists(d):
+            os.makedirs(d)
+        for l in LEVELS:
+            with open(d + l, 'w') as f:
+                f.write(defn(l))
+        def op ():
+            for l in LEVELS:
+                decompress_lvl(compress_lvl((1, l), version))
+        return None, op
+    return bench
+
+def parallel_solve (n_workers):
+    def bench (game):
+        d = defn(SOLVE_LEVEL)
+        def op ():
+            soln = ParallelSolver(d, n_workers, None, None).solve()
+            assert soln is not None, 'no solution found'
+        return None, op
+    return bench
+
+def main_menu (game):
+    if conf.SOUND_THEME not in conf.sound_themes():
+        # sounds might not be installed
+        conf.SOUND_THEME = 'none'
+    def op ():
+        MainMenu(game, eh.EventHandler())
+    return None, op
+
+BENCHMARKS = [('step/{0}x{0}'.format(n), step(n)) for n in (10, 30, 60)]
+BENCHMARKS += [('replay/' + l, replay(l)) for l in LEVELS]
+BENCHMARKS += [
+    ('draw/full', draw(False)),
+    ('draw/partial', draw(True)),
+    ('tiler/tile_sizes', tile_sizes),
+    ('fonts/text', fonts_text),
+    ('codec/v1', codec(1)),
+    ('codec/v2', codec(2)),
+    ('menu/main_init', main_menu)
+]
+BENCHMARKS += [('solver/parallel/{0}'.format(n), parallel_solve(n))
+               for n in WORKERS]
+
+
+def run_benchmark (game, bench, repeat):
+    """Run a benchmark and return {'best': t, 'median': t} in seconds."""
+    setup, op = bench(game)
+    times = []
+    for i in xrange(repeat):
+        if setup is not None:
+            setup()
+        t0 = time()
+        op()
+        times.append(time() - t0)
+    times.sort()
+    return {'best': times[0], 'median': times[len(times) / 2]}
+
+def scaling (results):
+    """Print and return the parallel solver's speedup for each worker count.
+
+scaling(results) -> {n_workers: speedup}
+
+"""
+    speedups = {}
+    base = results.get('solver/parallel/1', {}).get('best')
+    if base is None:
+        return speedups
+    print '\n{0:<8} {1:>8} {2:>10}'.format('workers', 'speedup',
+                                            'efficiency')
+    for n in WORKERS:
+        t = results.get('solver/parallel/{0}'.format(n), {}).get('best')
+        if t is None:
+            continue
+        speedups[n] = base / t
+        print '{0:<8} {1:>7.2f}x {2:>9.0%}'.format(n, speedups[n],
+                                                   speedups[n] / n)
+    return speedups
+
+def compare (results, baseline, threshold):
+    """Print a comparison of results and return whether any regressed."""
+    regressed = False
+    print '\n{0:<24} {1:>10} {2:>10} {3:>8}'.format('benchmark', 'old (ms)',
+                                                   'new (ms)', 'change')
+    for name in sorted(results):
+        new = results[name].get('best')
+        old = baseline.get(name, {}).get('best')
+        if old is None:
+            continue
+        elif new is None:
+            regressed = True
+            print '{0:<24} {1:>10.2f} {2:>10} {3:>8} !'.format(
+                name, 1000 * old, 'failed', ''
+            )
+            continue
+        change = new / old - 1
+        flag = ''
+        if change > threshold:
+            regressed = True
+            flag = ' !'
+        print '{0:<24} {1:>10.2f} {2:>10.2f} {3:>+7.1%}{4}'.format(
+            name, 1000 * old, 1000 * new, change, flag
+        )
+    return regressed
+
+def main (argv):
+    try:
+        opts, names = getopt(argv, 'o:c:t:r:')
+    except GetoptError, e:
+        sys.exit('{0}\n{1}'.format(e, __doc__))
+    opts = dict(opts)
+    repeat = int(opts.get('-r', 5))
+    threshold = float(opts.get('-t', .1))
+    game = run.Game(Idle)
+    game.screen = pygame.display.set_mode(RES)
+    results = {}
+    for name, bench in BENCHMARKS:
+        if names and not any(name.startswith(n) for n in names):
+            continue
+        try:
+            result = run_benchmark(game, bench, repeat)
+        except Exception, e:
+            # missing optional dependencies, for example
+            result = {'error': '{0}: {1}'.format(type(e).__name__, e)}
+            print '{0:<24} failed: {1}'.format(name, result['error'])
+        else:
+            print '{0:<24} {1:>10.2f} ms (median {2:.2f})'.format(
+                name, 1000 * result['best'], 1000 * result['median']
+            )
+        results[name] = result
+    speedups = scaling(results)
+    if '-o' in opts:
+        data = {
+            'meta': {
+                'time': strftime('%Y-%m-%d %H:%M:%S'),
+                'python': platform.python_version(),
+                'pygame': pygame.version.ver,
+                'platform': platform.platform(),
+                'cpus': cpu_count(),
+                'repeat': repeat
+            },
+            'results': results,
+            # JSON keys are strings
+            'scaling': dict((str(n), s) for n, s in speedups.items())
+        }
+        with open(opts['-o'], 'w') as f:
+            json.dump(data, f, indent = 4, sort_keys = True)
+    if '-c' in opts:
+        with open(opts['-c']) as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, threshold):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    try:
+        main(sys.argv[1:])
+    finally:
+        pygame.quit()
+        rmtree(TMP)
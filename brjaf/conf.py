@@ -12,6 +12,10 @@ version.
 import os
 import sys
 import string
+import atexit
+import ast
+from collections import deque
+from threading import Timer, Lock
 
 import pygame as pg
 
@@ -34,8 +38,12 @@ else:
 CONF_DIR += os.sep + ('' if os.name == 'nt' else '.') + 'brjaf' + os.sep
 CONF_FILE = CONF_DIR + 'conf'
 
+_set = set # set is shadowed later on
+
 # read local conf file into dict
 _local = {}
+# parsed values from _local
+_cache = {}
 try:
     with open(CONF_FILE) as f:
         lines = f.readlines()
@@ -54,13 +62,119 @@ else:
         v = line[eq + 1:].strip()
         _local[k] = v
 
+# settings whose defaults depend on other settings: [(key, function, user)]
+_derived = []
+# types for settings that aren't stored as they are saved: {key: function}
+_types = {}
+# pending write to file (threading.Timer)
+_save_timer = None
+_save_lock = Lock()
+
 def save_conf ():
-    """Save current changed settings to file."""
-    if not os.path.exists(CONF_DIR):
-        os.makedirs(CONF_DIR)
-    with open(CONF_FILE, 'w') as f:
+    """Save current changed settings to file.
+
+The file is written to a temporary file which then replaces the existing one, so
+it is never left partly written.  Only one save runs at a time.
+
+"""
+    global _save_timer
+    with _save_lock:
+        if _save_timer is not None:
+            _save_timer.cancel()
+            _save_timer = None
         s = '\n'.join('{0} = {1}'.format(k, v) for k, v in _local.iteritems())
-        f.write(s)
+        if not os.path.exists(CONF_DIR):
+            os.makedirs(CONF_DIR)
+        tmp = CONF_FILE + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(s)
+        try:
+            os.rename(tmp, CONF_FILE)
+        except OSError:
+            if os.name != 'nt':
+                raise
+            # Windows won't replace existing files
+            os.remove(CONF_FILE)
+            os.rename(tmp, CONF_FILE)
+
+def _save_conf_later ():
+    """Save settings to file soon, in another thread (see SAVE_DELAY)."""
+    global _save_timer
+    with _save_lock:
+        if _save_timer is None:
+            _save_timer = Timer(SAVE_DELAY, save_conf)
+            _save_timer.daemon = True
+            _save_timer.start()
+
+def _save_conf_at_exit ():
+    timer = _save_timer
+    if timer is not None:
+        save_conf()
+        # let the cancelled thread finish before the interpreter shuts down
+        timer.join()
+
+atexit.register(_save_conf_at_exit)
+
+def _parse (s):
+    """Parse a setting's value as saved in the settings file.
+
+_parse(s) -> value
+
+Only literals are allowed, along with names of settings defined before this
+one, attributes of pygame (like pg.K_a), unary + and - and | (to combine
+flags).
+Raises ValueError if the value is not valid.
+
+"""
+    try:
+        node = ast.parse(s.strip(), mode = 'eval').body
+    except SyntaxError, e:
+        raise ValueError(str(e))
+    return _parse_node(node)
+
+def _parse_node (node):
+    """Get the value of an ast node; see _parse."""
+    if isinstance(node, ast.Str):
+        return node.s
+    elif isinstance(node, ast.Num):
+        return node.n
+    elif isinstance(node, ast.Tuple):
+        return tuple(_parse_node(n) for n in node.elts)
+    elif isinstance(node, ast.List):
+        return [_parse_node(n) for n in node.elts]
+    elif isinstance(node, ast.Dict):
+        return dict((_parse_node(k), _parse_node(v))
+                    for k, v in zip(node.keys, node.values))
+    elif isinstance(node, ast.Name):
+        consts = {'None': None, 'True': True, 'False': False}
+        if node.id in consts:
+            return consts[node.id]
+        elif node.id.isupper() and node.id in globals():
+            return globals()[node.id]
+    elif isinstance(node, ast.Attribute):
+        if isinstance(node.value, ast.Name) and node.value.id == 'pg' and \
+           not node.attr.startswith('_'):
+            try:
+                return getattr(pg, node.attr)
+            except AttributeError:
+                pass
+    elif isinstance(node, ast.UnaryOp):
+        if isinstance(node.op, ast.USub):
+            return -_parse_node(node.operand)
+        elif isinstance(node.op, ast.UAdd):
+            return +_parse_node(node.operand)
+    elif isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitOr):
+        return _parse_node(node.left) | _parse_node(node.right)
+    raise ValueError('invalid setting value: {0}'.format(ast.dump(node)))
+
+def _repr (value):
+    """Get the string to save for a setting's value (the inverse of _parse)."""
+    if isinstance(value, (_set, frozenset)):
+        return repr(sorted(value))
+    elif isinstance(value, deque):
+        return repr(list(value))
+    else:
+        return repr(value)
 
 def get (key, default = None):
     """Get a setting's value.
@@ -72,34 +186,88 @@ default: the value to return if the setting has not been saved.
 
 """
     # look in this module first, then _local, then return default
+    key = key.upper()
     try:
-        return globals()[key.upper()]
+        return globals()[key]
     except KeyError:
-        try:
-            return eval(_local[key.upper()])
-        except KeyError:
-            return default
+        pass
+    try:
+        return _cache[key]
+    except KeyError:
+        pass
+    try:
+        value = _local[key]
+    except KeyError:
+        return default
+    value = _cache[key] = _parse(value)
+    return value
+
+def derive (key, fn, user = True):
+    """Get the value of a setting whose default depends on other settings.
+
+derive(key, fn, user = True) -> value
+
+key: the setting's name; case-insensitive.
+fn: a function that takes no arguments and returns the default value.  This is
+    called again whenever settings are changed using set.
+user: whether the setting can be saved; if False, fn always gives its value.
+
+"""
+    key = key.upper()
+    _derived.append((key, fn, user))
+    return get(key, fn()) if user else fn()
+
+def typed (key, type_, default = ()):
+    """Get the value of a setting, converted to another type.
+
+typed(key, type_, default = ()) -> value
+
+key: the setting's name; case-insensitive.
+type_: a function that takes the value as saved and returns it converted.
+       Values passed to set for this setting are converted in the same way.
+default: the value to convert if the setting has not been saved.
+
+"""
+    key = key.upper()
+    _types[key] = type_
+    return type_(get(key, default))
 
 
 # timing
 FPS = get('fps', 10)
-FRAME = get('frame', 1. / FPS)
+FRAME = derive('frame', lambda: 1. / FPS)
 MENU_FPS = get('menu_fps', 30)
-MENU_FRAME = get('menu_frame', 1. / MENU_FPS)
+MENU_FRAME = derive('menu_frame', lambda: 1. / MENU_FPS)
+SAVE_DELAY = get('save_delay', 2) # seconds to batch up settings changes for
+MAX_DRAW_FPS = get('max_draw_fps', 60)
+# frames to run without drawing before giving up on catching up
+MAX_FRAMES_PER_DRAW = get('max_frames_per_draw', 10)
 
 # paths
 DATA_DIR = get('data_dir', '')
-IMG_DIR = get('img_dir', DATA_DIR + 'img' + os.sep)
-SOUND_DIR = get('sound_dir', DATA_DIR + 'sound' + os.sep)
-MUSIC_DIR = get('music_dir', DATA_DIR + 'music' + os.sep)
-LEVEL_DIR_MAIN = get('level_dir_main', DATA_DIR + 'lvl' + os.sep)
-FONT_DIR = get('font_dir', DATA_DIR + 'font' + os.sep)
+IMG_DIR = derive('img_dir', lambda: DATA_DIR + 'img' + os.sep)
+SOUND_DIR = derive('sound_dir', lambda: DATA_DIR + 'sound' + os.sep)
+MUSIC_DIR = derive('music_dir', lambda: DATA_DIR + 'music' + os.sep)
+LEVEL_DIR_MAIN = derive('level_dir_main', lambda: DATA_DIR + 'lvl' + os.sep)
+FONT_DIR = derive('font_dir', lambda: DATA_DIR + 'font' + os.sep)
 LEVEL_DIR_CUSTOM = get('level_dir_custom', CONF_DIR + 'lvl' + os.sep)
-LEVEL_DIR_DRAFT = get('level_dir_draft', LEVEL_DIR_CUSTOM + 'draft' + os.sep)
+LEVEL_DIR_DRAFT = derive('level_dir_draft',
+                         lambda: LEVEL_DIR_CUSTOM + 'draft' + os.sep)
+VERIFY_CACHE_FILE = get('verify_cache_file', CONF_DIR + 'verified')
+VERIFY_CACHE_SIZE = get('verify_cache_size', 1000) # solutions remembered
+THUMBNAIL_DIR = get('thumbnail_dir', CONF_DIR + 'thumb' + os.sep)
 
 # CLI
 DEBUG = get('debug', False)
-SILENT = get('silent', True and not DEBUG)
+SEED = get('seed', None) # for Game.rng; None to seed randomly
+SILENT = derive('silent', lambda: True and not DEBUG)
+
+# profiling
+PROFILE = get('profile', False) # record timings even when not shown
+PROFILE_HISTORY = get('profile_history', 300) # timings kept for statistics
+PROFILE_FILE = get('profile_file', CONF_DIR + 'profile.csv') # or .json
+PROFILE_FONT_SIZE = get('profile_font_size', 16)
+PROFILE_UPDATE_DELAY = get('profile_update_delay', .5) # seconds
 
 # window
 WINDOW_ICON = get('window_icon', 'icon.png')
@@ -107,7 +275,8 @@ WINDOW_TITLE = get('window_title', 'Brain requirement just a formality')
 MOUSE_VISIBLE = get('mouse_visible', True)
 RESIZABLE = get('resizable', True)
 FULLSCREEN = get('fullscreen', False)
-RES_F = get('res_f', pg.display.list_modes()[0])
+# None to use the largest available resolution (looked up when first needed)
+RES_F = get('res_f', None)
 RES_W = get('res_w', (720, 480))
 FLAGS = get('flags', 0)
 MIN_RES_W = get('min_res_w', (320, 240))
@@ -123,34 +292,40 @@ KEYS_HOME = get('keys_home', (pg.K_HOME,))
 KEYS_END = get('keys_end', (pg.K_END,))
 KEYS_PAGE_UP = get('keys_page_up', (pg.K_PAGEUP,))
 KEYS_PAGE_DOWN = get('keys_page_down', (pg.K_PAGEDOWN,))
-KEYS_SOLN_NEXT = get('keys_soln_next', KEYS_RIGHT)
+KEYS_SOLN_NEXT = derive('keys_soln_next', lambda: KEYS_RIGHT)
 # movement keys: l/u/r/d/ul/ur/dr/dl
 KEYS_MOVE = get('keys_move', {
     'QWERTY': (pg.K_a, pg.K_w, pg.K_d, pg.K_s, pg.K_q, pg.K_e, pg.K_x, pg.K_z),
     'Dvorak': (pg.K_a, pg.K_COMMA, pg.K_e, pg.K_o, (pg.K_SLASH, pg.K_QUOTE),
                pg.K_PERIOD, pg.K_q, pg.K_SEMICOLON)
 })
-KB_LAYOUTS = KEYS_MOVE.keys()
+KB_LAYOUTS = derive('kb_layouts', lambda: KEYS_MOVE.keys(), False)
 KB_LAYOUT = get('kb_layout', 'QWERTY')
-ks = []
-def ks (i, extra = ()):
+def _keys_move (i, extra = ()):
     rtn = {}
     for layout in KB_LAYOUTS:
         k = KEYS_MOVE[layout][i]
         rtn[layout] = ((k,) if isinstance(k, int) else k) + extra
     return rtn
-KEYS_MOVE_LEFT = ks(0, KEYS_LEFT)
-KEYS_MOVE_UP = ks(1, KEYS_UP)
-KEYS_MOVE_RIGHT = ks(2, KEYS_RIGHT)
-KEYS_MOVE_DOWN = ks(3, KEYS_DOWN)
-KEYS_MOVE_UPLEFT = ks(4)
-KEYS_MOVE_UPRIGHT = ks(5)
-KEYS_MOVE_DOWNRIGHT = ks(6)
-KEYS_MOVE_DOWNLEFT = ks(7)
-del ks
+KEYS_MOVE_LEFT = derive('keys_move_left',
+                        lambda: _keys_move(0, KEYS_LEFT), False)
+KEYS_MOVE_UP = derive('keys_move_up', lambda: _keys_move(1, KEYS_UP), False)
+KEYS_MOVE_RIGHT = derive('keys_move_right',
+                         lambda: _keys_move(2, KEYS_RIGHT), False)
+KEYS_MOVE_DOWN = derive('keys_move_down',
+                        lambda: _keys_move(3, KEYS_DOWN), False)
+KEYS_MOVE_UPLEFT = derive('keys_move_upleft', lambda: _keys_move(4), False)
+KEYS_MOVE_UPRIGHT = derive('keys_move_upright', lambda: _keys_move(5), False)
+KEYS_MOVE_DOWNRIGHT = derive('keys_move_downright', lambda: _keys_move(6),
+                             False)
+KEYS_MOVE_DOWNLEFT = derive('keys_move_downleft', lambda: _keys_move(7),
+                            False)
 KEYS_MULTI = get('keys_multi', pg.KMOD_CTRL)
 
 KEYS_MINIMISE = get('keys_minimise', (pg.K_F10,))
+KEYS_PROFILE = get('keys_profile', ((pg.K_F12, 0, True),))
+KEYS_PROFILE_DUMP = get('keys_profile_dump',
+                        ((pg.K_F12, pg.KMOD_SHIFT, True),))
 KEYS_FULLSCREEN = get('keys_fullscreen', (pg.K_F11,
     (pg.K_RETURN, pg.KMOD_ALT, True), (pg.K_KP_ENTER, pg.KMOD_ALT, True)))
 KEYS_BACK = get('keys_back', (pg.K_BACKSPACE, pg.K_ESCAPE))
@@ -166,15 +341,16 @@ KEYS_ALTER_HOME = get('keys_alter_home', ((pg.K_LEFT, pg.KMOD_CTRL, True),))
 KEYS_ALTER_END = get('keys_alter_end', ((pg.K_RIGHT, pg.KMOD_CTRL, True),))
 KEYS_RESET = get('keys_reset', ((pg.K_r, 0, True),))
 KEYS_TAB = get('keys_tab', (pg.K_TAB, pg.K_F8, pg.K_SLASH, pg.K_BACKSLASH))
-KEYS_INSERT = get('keys_insert', KEYS_NEXT + (pg.K_i, pg.K_INSERT))
+KEYS_INSERT = derive('keys_insert', lambda: KEYS_NEXT + (pg.K_i, pg.K_INSERT))
 KEYS_DEL = get('keys_del', (pg.K_DELETE, pg.K_d))
 KEYS_UNDO = get('keys_undo', ((pg.K_u, 0, True), (pg.K_z, pg.KMOD_CTRL, True)))
 KEYS_REDO = get('keys_redo', ((pg.K_r, pg.KMOD_CTRL, True),
                               (pg.K_y, pg.KMOD_CTRL, True),
                               (pg.K_z, (pg.KMOD_CTRL, pg.KMOD_SHIFT), True)))
 
-MOVE_INITIAL_DELAY = get('move_initial_delay', 2. / FPS)
-MOVE_REPEAT_DELAY = 1. / FPS # shouldn't be edited: required for some puzzles
+MOVE_INITIAL_DELAY = derive('move_initial_delay', lambda: 2. / FPS)
+# shouldn't be edited: required for some puzzles
+MOVE_REPEAT_DELAY = derive('move_repeat_delay', lambda: 1. / FPS, False)
 MENU_INITIAL_DELAY = get('menu_initial_delay', .3)
 MENU_REPEAT_DELAY = get('menu_repeat_delay', .15)
 
@@ -182,9 +358,7 @@ MENU_REPEAT_DELAY = get('menu_repeat_delay', .15)
 PUZZLE_TEXT_UPPER = get('puzzle_text_upper', True)
 PRINTABLE_L = [c for c in string.printable if c not in string.whitespace]
 PRINTABLE_L.append(' ')
-PRINTABLE = get('printable_l', PRINTABLE_L)
-PRINTABLE = set(PRINTABLE_L)
-PRINTABLE = get('printable', PRINTABLE)
+PRINTABLE = derive('printable', lambda: _set(PRINTABLE_L))
 IGNORED_ACCESS_KEY_CHARS = get('ignored_access_key_chars', ' ')
 MIN_CHAR_ID = get('min_char_id', 32)
 MAX_CHAR_ID = get('max_char_id', 255)
@@ -193,7 +367,11 @@ SPECIAL_CHAR_ID_OFFSET = get('special_char_id_offset', 512)
 DEFAULT_SELECT_ORDER = 0 # 0 for rows take precedence, 1 for columns
 LEVEL_SELECT_COLS = get('level_select_cols', 5)
 POST_SOLVE_WAIT = get('post_solve_wait', 1000)
+EVENT_VERIFY = pg.USEREVENT + 1 # posted by verify.Verifier
 NUM_UNCOMPLETED_LEVELS = get('num_uncompleted_levels', 5)
+# level thumbnails are drawn to fit in this size, in pixels
+THUMBNAIL_SIZE = get('thumbnail_size', (160, 120))
+THUMBNAIL_WORKERS = get('thumbnail_workers', 2) # threads drawing thumbnails
 # (small, mid, large, very large)
 # < 1 means fraction of total number of options, >= 1 means absolute value
 SELECT_STEP = get('select_step', (1, .01, 5, .05))
@@ -201,12 +379,27 @@ MIN_SELECT_STEP = get('min_select_step', (1, 1, .01, 5))
 
 # puzzle
 FORCE_MOVE = get('force_move', 2)
-FORCE_ARROW = FORCE_MOVE # some puzzles are impossible/too easy if different
+# some puzzles are impossible/too easy if different
+FORCE_ARROW = derive('force_arrow', lambda: FORCE_MOVE, False)
 SOLVE_SPEED = get('solve_speed', 5) # delay between moves in frames
 END_SOLVE_DELAY = get('end_solve_delay', 10)
 FF_SPEEDUP = get('ff_speedup', 4)
 SOLN_DIRS = get('soln_dirs', 'lurd')
-SOLN_DIRS_SHOWN = get('soln_dirs_shown', SOLN_DIRS.upper())
+SOLN_DIRS_SHOWN = derive('soln_dirs_shown', lambda: SOLN_DIRS.upper())
+# tiles are never smaller than this, in pixels: bigger puzzles scroll instead
+MIN_TILE_SIZE = get('min_tile_size', 16)
+# tiles to keep between the selection or player and the edge when scrolling
+VIEW_MARGIN = get('view_margin', 2)
+# automatic solver
+SOLVER_TIME_LIMIT = get('solver_time_limit', 30) # seconds
+SOLVER_MAX_STATES = get('solver_max_states', 500000)
+SOLVER_TABLE_SIZE = get('solver_table_size', 2 ** 20)
+# states each ParallelSolver worker expands between sending new states on
+SOLVER_BATCH_SIZE = get('solver_batch_size', 100)
+MINIMISER_MAX_SLACK = get('minimiser_max_slack', 20) # frames
+# block updates allowed per block when a simulated frame's forces are resolved;
+# some puzzles never finish resolving, so simulations give up after this many
+STEP_UPDATE_LIMIT = get('step_update_limit', 100)
 
 # messages
 SHOW_MSG = get('show_msg', 1)
@@ -253,6 +446,12 @@ HELP_MSG_WEIGHTING_FNS = get('help_msg_weighting_fn', {
 HELP_MSG_MIN_SOLVED = get('help_msg_min_solved', 5)
 SOLVE_HISTORY_SIZE = get('solve_history_size', 20)
 
+# progress
+COMPLETED_LEVELS = typed('completed_levels', _set)
+# whether each level was solved by the player (True) or automatically (False)
+SOLVE_METHODS = typed('solve_methods',
+                      lambda methods: deque(methods, SOLVE_HISTORY_SIZE))
+
 # editor
 EDITOR_WIDTH = get('editor_width', .7) # proportion of screen width
 BLANK_LEVEL = get('blank_level', '5 5')
@@ -261,6 +460,9 @@ RESIZE_DEAD_ZONE_BOUNDARY = get('resize_dead_zone_boundary', .4)
 RESIZE_LENGTH = get('resize_speed', .07)
 LEVEL_NAME_LENGTH = get('level_name_length', 6)
 EDITOR_ARROW_PADDING = get('editor_arrow_padding', .05) # eats into editor
+# seconds without changes before playtesting the level's solutions
+PLAYTEST_DELAY = get('playtest_delay', .5)
+PLAYTEST_LINE_HEIGHT = get('playtest_line_height', .04) # max, of screen height
 
 # IDs
 MIN_ID = -6
@@ -287,7 +489,7 @@ WALL = 99
 # appearance
 THEMES = ('default',)
 DEFAULT_THEME = get('default_theme', 'default')
-THEME = get('theme', DEFAULT_THEME)
+THEME = derive('theme', lambda: DEFAULT_THEME)
 # menu
 RAND_B_RATIO = get('rand_b_ratio', {
     'default': .1
@@ -364,15 +566,7 @@ BLOCK_COLOURS = get('block_colours', {
 MUSIC_VOLUME = get('music_volume', 50)
 EVENT_ENDMUSIC = pg.USEREVENT
 SOUND_VOLUME = get('sound_volume', 50)
-SOUND_THEMES = set()
-for d in (SOUND_DIR, MUSIC_DIR):
-    try:
-        SOUND_THEMES = SOUND_THEMES.union(os.listdir(d))
-    except OSError:
-        # directory doesn't exist
-        pass
-SOUND_THEMES.add('none')
-SOUND_THEMES = sorted(SOUND_THEMES)
+_sound_themes = (None, None) # (dirs, themes) cache for sound_themes
 SOUND_THEME = get('sound_theme', 'default')
 SOUNDS = {'move': 1, 'hit': 1, 'wall': 1}
 SOUND_VOLUMES = {}
@@ -386,18 +580,46 @@ def set (**settings):
 set(**settings)
 
 key: the setting's name; case-insensitive.
-value: the value to store.  This must have the property that
-       eval(repr(value)) == value.
+value: the value to store.  This must be made up of literals (see _parse), sets
+       or deques (which are saved as lists).
+
+Settings take effect immediately, along with any settings that depend on them
+(see derive).  Changes are written to file together a little later (after
+SAVE_DELAY seconds), in another thread, or when the program exits.
 
 """
-    for key, value in settings.iteritems():
-        self = sys.modules[__name__]
-        setattr(self, key.upper(), value)
-        _local[key.upper()] = repr(value)
-        save_conf()
-    # hack: delete settings stored here first, so loading settings doesn't get
-    # previous ones in the module (and need to ignore __name__, for example)
-    for attr in [a for a in vars(self).keys() if not a.startswith('__')]:
-        delattr(self, attr)
-    # reload this module to ensure settings depending on this one are updated
-    reload(self)
\ No newline at end of file
+    self = sys.modules[__name__]
+    with _save_lock:
+        for key, value in settings.iteritems():
+            key = key.upper()
+            if key in _types:
+                value = _types[key](value)
+            setattr(self, key, value)
+            _cache[key] = value
+            _local[key] = _repr(value)
+    # update settings that depend on these
+    for key, fn, user in _derived:
+        if not user or key not in _local:
+            setattr(self, key, fn())
+    _save_conf_later()
+
+def sound_themes ():
+    """Get a sorted list of available sound themes, including 'none'.
+
+The sound and music directories are only searched the first time this is
+called (or if they change).
+
+"""
+    global _sound_themes
+    dirs = (SOUND_DIR, MUSIC_DIR)
+    if _sound_themes[0] != dirs:
+        # (set is shadowed here)
+        themes = frozenset(['none'])
+        for d in dirs:
+            try:
+                themes = themes.union(os.listdir(d))
+            except OSError:
+                # directory doesn't exist
+                pass
+        _sound_themes = (dirs, sorted(themes))
+    return _sound_themes[1]
@@ -14,6 +14,8 @@ from ext import evthandler as eh
 
 import menu
 from puzzle import Puzzle, BoringBlock
+from journal import Journal
+import playtest
 import level
 import conf
 
@@ -193,7 +195,7 @@ Takes the Editor instance.
     def init (self, editor):
         self._editor = editor
         self._default_selections[1] = (0, 2)
-        if editor.state > 0:
+        if editor.journal.position > 0:
             reset_data = (self.set_page, 1)
         else:
             reset_data = (self.game.quit_backend,)
@@ -227,7 +229,9 @@ Takes the Editor instance.
         if hasattr(self, '_lvl'):
             self.game.quit_backend()
             # retrieve solution and add to definition
-            self._defn += '\n: ' + self._lvl.stop_recording()
+            soln = self._lvl.stop_recording()
+            self._defn += '\n: ' + soln
+            self._editor.add_solution(soln)
             del self._lvl
             d = conf.LEVEL_DIR_CUSTOM
         else:
@@ -244,7 +248,7 @@ Takes the Editor instance.
         defn = e.editor.definition()
         if not draft:
             # check if there's a player block
-            if not any(b.type == conf.B_PLAYER for b in e.editor.blocks):
+            if not e.editor.blocks.of_type(conf.B_PLAYER):
                 self.set_page(2)
                 return
             # check if already winning
@@ -283,6 +287,7 @@ resize
 insert
 delete
 set_block
+add_solution
 undo
 redo
 click_tile
@@ -300,8 +305,15 @@ editor: the puzzle being edited.
 editor_rect: the rect the editor puzzle is drawn in, or None if unknown.
 puzzle: the current visible puzzle (editor or selector).
 editing: whether the current puzzle is editor.
-changes: a list of changes that have been made to the puzzle.
-state: the current position in the changes list.
+journal: a journal.Journal instance holding changes made to the puzzle.  Each
+         record is a tuple whose first item is 'set_block', 'set_surface' or
+         'resize' (see Editor.change).
+solutions: the solutions in the loaded level's definition, followed by any
+           recorded since.  These are checked against the puzzle in the
+           background once it hasn't changed for conf.PLAYTEST_DELAY seconds,
+           and how each does is shown under the puzzle.
+playtest: the playtest.Playtest instance for the latest check of solutions, or
+          None.
 
 """
 
@@ -311,7 +323,8 @@ state: the current position in the changes list.
         event_handler.add_event_handlers({
             pygame.MOUSEBUTTONDOWN: self._click,
             pygame.MOUSEBUTTONUP: self._unclick,
-            pygame.MOUSEMOTION: lambda e: setattr(self, 'mouse_moved', True)
+            # use the event's position so that recorded sessions replay properly
+            pygame.MOUSEMOTION: lambda e: setattr(self, 'mouse_moved', e.pos)
         })
         pzl_args = (
             eh.MODE_ONDOWN_REPEAT,
@@ -388,30 +401,96 @@ defn: if ID is not given, load a level from this definition; if this is not
         self.puzzle = self.editor
         self.editing = True
         self.dirty = True
-        self.changes = []
-        self.state = 0
+        # reset goes straight back to what was loaded
+        self._checkpoint = defn
+        self.journal = Journal(conf.UNDO_LEVELS)
         self.mouse_moved = False
         self.resizing = False
+        # solutions to playtest
+        self.solutions = [line.strip()[1:].strip()
+                          for line in defn.split('\n')
+                          if line.strip().startswith(':')]
+        if getattr(self, 'playtest', None) is not None:
+            self.playtest.cancel()
+        self.playtest = None
+        self._playtest_status = None
+        self._playtest_changed = None
+        # no need to wait before the first playtest
+        self._playtest_wait = 1
 
     def change (self, *data):
-        """Make a change to the puzzle; takes data to store in self.changes."""
-        cs = self.changes
-        # purge 'future' states
-        cs = cs[:self.state]
-        cs.append(data)
-        # purge oldest state if need to (don't need to increment state, then)
-        if len(cs) > conf.UNDO_LEVELS > 0:
-            cs.pop(0)
-        else:
-            self.state += 1
-        self.changes = cs
+        """Record a change made to the puzzle.
+
+Takes the record's data, which is one of:
+
+    'set_block', x, y, old, new
+        where old and new are as returned by Editor.block_data.
+    'set_surface', x, y, old, new
+        where old and new are surface IDs.
+    'resize', amount, direction, lost
+        as taken by puzzle.Puzzle.resize, where amount is the amount actually
+        resized by, and lost is a tuple of (obj, x, y), where obj is a surface
+        ID or as returned by Editor.block_data.
+
+"""
+        self.journal.record(data)
+        self._edited(self._changed_tiles(data))
+
+    @staticmethod
+    def block_data (b):
+        """Get data for the journal representing a block.
+
+block_data(b) -> data
+
+b: BoringBlock instance, or None.
+
+data: (type_ID, direction) tuple, or None if b is None.
+
+"""
+        return None if b is None else (b.type, b.dirn)
+
+    @staticmethod
+    def _changed_tiles (record):
+        """Get the changed tiles to pass to Editor._edited for a record."""
+        return set([record[1:3]]) if record[0] == 'set_surface' else None
+
+    def _edited (self, tiles = None):
+        """Schedule a playtest after a change.
+
+tiles: the set of (x, y) tiles whose surfaces changed, or None if anything else
+       might have changed too.
+
+"""
+        self._playtest_changed = playtest.union(self._playtest_changed, tiles)
+        self._playtest_wait = max(int(conf.PLAYTEST_DELAY * conf.FPS), 1)
+
+    def _start_playtest (self):
+        """Start checking solutions against the current puzzle."""
+        if not self.solutions:
+            return
+        pt = self.playtest
+        changed = self._playtest_changed
+        if pt is not None and not pt.finished:
+            # start from what the unfinished one started from
+            pt.cancel()
+            changed = playtest.union(pt.changed, changed)
+            pt = pt.previous
+        self.playtest = playtest.Playtest(self.editor.definition(),
+                                          self.solutions, pt, changed)
+        self._playtest_changed = set()
 
     def resize (self, amount, dirn):
         """Like Editor.editor.resize, but do some wrapper stuff."""
+        axis = dirn % 2
+        old_size = self.editor.size[axis]
         lost = self.editor.resize(amount, dirn)
         # might not have changed
         if lost is not False:
             self.dirty = True
+            # might not have resized by the full amount
+            amount = self.editor.size[axis] - old_size
+            lost = tuple((obj if isinstance(obj, int) else
+                          self.block_data(obj), x, y) for obj, x, y in lost)
             self.change('resize', amount, dirn, lost)
 
     def _move (self, key, event, mods, direction):
@@ -452,16 +531,16 @@ defn: if ID is not given, load a level from this definition; if this is not
         current = self.editor.grid[x][y]
         if is_block:
             if current[1] is None or current[1].type != ID:
-                old_b = current[1]
+                old_b = self.block_data(current[1])
                 b = self.editor.add_block((BoringBlock, ID), x, y)
                 self.game.play_snd('place_block')
-                self.change('set_block', old_b, b, x, y)
+                self.change('set_block', x, y, old_b, self.block_data(b))
         else:
             if current[0] != ID:
                 old_ID = current[0]
                 self.editor.set_surface(x, y, ID)
                 self.game.play_snd('place_surface')
-                self.change('set_surface', old_ID, ID, x, y)
+                self.change('set_surface', x, y, old_ID, ID)
 
     def _insert_cb (self, *args):
         """Callback for conf.KEYS_INSERT."""
@@ -479,11 +558,11 @@ defn: if ID is not given, load a level from this definition; if this is not
             # delete block, if any
             if data[1] is not None:
                 b = self.editor.rm_block(None, x, y)
-                self.change('set_block', b, None, x, y)
+                self.change('set_block', x, y, self.block_data(b), None)
             # set surface to blank if not already
             elif data[0] != conf.S_BLANK:
                 s = self.editor.set_surface(x, y, conf.S_BLANK)
-                self.change('set_surface', s, conf.S_BLANK, x, y)
+                self.change('set_surface', x, y, s, conf.S_BLANK)
             else:
                 snd = False
             if snd:
@@ -494,31 +573,27 @@ defn: if ID is not given, load a level from this definition; if this is not
 
 set_block(b, x, y)
 
-b: BoringBlock instance, or None to remove.
+b: block data as returned by Editor.block_data, or None to remove.
 x, y: tile position.
 
 """
         if b is None:
             self.editor.rm_block(None, x, y)
         else:
-            self.editor.add_block(b, x, y)
-
-    def undo (self, *args):
-        """Undo changes to the puzzle."""
-        if self.state > 0:
-            self.state -= 1
-            # get change data
-            data = self.changes[self.state]
-            c, data = data[0], data[1:]
-            # make the change to the puzzle
-            if c == 'set_block':
-                old_b, new_b, x, y = data
-                self.set_block(old_b, x, y)
-            elif c == 'set_surface':
-                old, new, x, y = data
-                self.editor.set_surface(x, y, old)
-            elif c == 'resize':
-                amount, direction, lost = data
+            self.editor.add_block((BoringBlock,) + b, x, y)
+
+    def _apply (self, record, undo):
+        """Undo or redo a record from the journal."""
+        c, data = record[0], record[1:]
+        if c == 'set_block':
+            x, y, old, new = data
+            self.set_block(old if undo else new, x, y)
+        elif c == 'set_surface':
+            x, y, old, new = data
+            self.editor.set_surface(x, y, old if undo else new)
+        elif c == 'resize':
+            amount, direction, lost = data
+            if undo:
                 self.editor.resize(-amount, (direction - 2) % 4)
                 # restore stuff that was lost in the resize
                 for obj, x, y in lost:
@@ -526,26 +601,30 @@ x, y: tile position.
                         self.editor.set_surface(x, y, obj)
                     else:
                         self.set_block(obj, x, y)
-                self.dirty = True
+            else:
+                self.editor.resize(amount, direction)
+            self.dirty = True
+        self._edited(self._changed_tiles(record))
+
+    def add_solution (self, soln):
+        """Add a solution to Editor.solutions."""
+        self.solutions.append(soln)
+        # the puzzle hasn't changed
+        self._edited(set())
+
+    def undo (self, *args):
+        """Undo changes to the puzzle."""
+        records = self.journal.undo()
+        if records is not None:
+            for r in records:
+                self._apply(r, True)
 
     def redo (self, *args):
         """Redo undone changes."""
-        if self.state < len(self.changes):
-            # get change data
-            data = self.changes[self.state]
-            c, data = data[0], data[1:]
-            self.state += 1
-            # make the change to the puzzle
-            if c == 'set_block':
-                old_b, new_b, x, y = data
-                self.set_block(new_b, x, y)
-            elif c == 'set_surface':
-                old, new, x, y = data
-                self.editor.set_surface(x, y, new)
-            elif c == 'resize':
-                amount, direction, lost = data
-                self.editor.resize(amount, direction)
-                self.dirty = True
+        records = self.journal.redo()
+        if records is not None:
+            for r in records:
+                self._apply(r, False)
 
     def click_tile (self, insert, pos):
         """Insert or delete a block or surface at the given position.
@@ -599,12 +678,15 @@ pos: on-screen position to try to perform the action at.
             if self._resize_sides == [None, None]:
                 return
             self.resizing = list(pos)
+            # the whole drag is one change
+            self.journal.begin()
 
     def _unclick (self, evt):
         """Handle mouse click release."""
         if evt.button == 2 and self.resizing:
             self.resizing = False
             del self._resize_sides
+            self.journal.end()
 
     def switch_puzzle (self, *args):
         """Switch selected puzzle between editor and block selector."""
@@ -623,7 +705,7 @@ pos: on-screen position to try to perform the action at.
 
     def reset (self, *args):
         """Confirm resetting the puzzle."""
-        if self.state > 0:
+        if self.journal.position > 0:
             self.game.start_backend(Menu, 1, self)
         # else nothing to reset
 
@@ -633,14 +715,26 @@ pos: on-screen position to try to perform the action at.
 
     def _do_reset (self):
         """Actually reset the puzzle."""
-        # just reset to original state - to whatever was loaded, if anything
-        while self.state > 0:
-            self.undo()
+        j = self.journal
+        if j.forgotten:
+            # what was loaded is no longer reachable: undo as far as we can
+            while j.position > 0:
+                self.undo()
+        else:
+            # go straight back to what was loaded, keeping changes for redo
+            self.editor.load(self._checkpoint)
+            j.rewind()
+            self.dirty = True
+            self._edited()
 
     def update (self):
-        """Handle mouse movement."""
+        """Handle mouse movement and start playtests."""
+        if self._playtest_wait:
+            self._playtest_wait -= 1
+            if not self._playtest_wait:
+                self._start_playtest()
         if self.mouse_moved:
-            pos = pygame.mouse.get_pos()
+            pos = self.mouse_moved
             if self.resizing:
                 # change puzzle size if middle-click-dragging
                 old_pos = self.resizing
@@ -652,13 +746,13 @@ pos: on-screen position to try to perform the action at.
                     diff = pos[i] - old_pos[i]
                     threshold = min(conf.RESIZE_LENGTH * conf.RES[0],
                                     self.editor.tile_size(i))
-                    while abs(diff) >= threshold:
-                        # resize
+                    n = int(abs(diff) / threshold)
+                    if n:
+                        # resize by all the steps moved this frame at once
                         sign = 1 if diff > 0 else -1
-                        self.resize(sign * side, i + 2 * (sign == 1))
+                        self.resize(sign * side * n, i + 2 * (sign == 1))
                         # prepare for resizing again
-                        old_pos[i] += sign * threshold
-                        diff -= sign * threshold
+                        old_pos[i] += sign * threshold * n
             else:
                 # change selection based on mouse position
                 # get tile under mouse
@@ -677,6 +771,67 @@ pos: on-screen position to try to perform the action at.
                             self.switch_puzzle()
             self.mouse_moved = False
 
+    def _playtest_text (self):
+        """Get text showing how each solution does in the latest playtest."""
+        pt = self.playtest
+        if pt is None:
+            return ''
+        # results are out of date while waiting to start a new playtest
+        results = [] if self._playtest_wait else pt.results
+        text = []
+        for i in xrange(len(self.solutions)):
+            if i < len(results):
+                status, frame = results[i]
+                if status == playtest.WINS:
+                    status = 'wins at {0}'.format(frame)
+                elif status == playtest.FAILS:
+                    status = 'fails'
+                else:
+                    status = 'starts winning'
+            else:
+                status = '...'
+            text.append('{0}: {1}'.format(i + 1, status))
+        return '   '.join(text)
+
+    def _draw_playtest (self, screen, text, pad):
+        """Draw playtest results under the editor puzzle.
+
+_draw_playtest(screen, text, pad) -> rect
+
+screen: surface to draw to.
+text: as returned by Editor._playtest_text.
+pad: the size of the padding around the editor puzzle.
+
+rect: the rect drawn in.
+
+"""
+        sw, sh = screen.get_size()
+        l, t, w, h = self.editor_rect[0]
+        # below the bottom arrows
+        top = t + h + pad / 2
+        rect = pygame.Rect(0, top, int(conf.EDITOR_WIDTH * sw), sh - top)
+        screen.fill(conf.BG[conf.THEME], rect)
+        if not text:
+            return rect
+        size = min(rect.h, int(sh * conf.PLAYTEST_LINE_HEIGHT))
+        font = [conf.MSG_FONT[conf.THEME], size, False]
+        args = (text, conf.MSG_TEXT_COLOUR[conf.THEME], None, rect.w, 1, True)
+        # reduce font size until it fits
+        while font[1] > 0:
+            try:
+                img, lines = self.game.fonts.text(font, *args)
+            except ValueError:
+                pass
+            else:
+                if img.get_height() <= rect.h:
+                    break
+            font[1] -= 1
+        if font[1] > 0:
+            img_w, img_h = img.get_size()
+            screen.blit(img, (rect.centerx - img_w / 2,
+                              rect.centery - img_h / 2))
+        return rect
+
     def draw (self, screen):
         """Draw the puzzles."""
         w, h = screen.get_size()
@@ -741,5 +896,13 @@ pos: on-screen position to try to perform the action at.
                     source = imgs[4 * (i in special)]
                     imgs[img] = pygame.transform.rotate(source, -90 * img)
                 screen.blit(imgs[img], p)
+        # draw playtest results
+        text = self._playtest_text()
+        if self.editor_rect and (self.dirty or
+                                 text != self._playtest_status):
+            self._playtest_status = text
+            rect = self._draw_playtest(screen, text, pad)
+            if drawn is not True:
+                drawn.append(rect)
         self.dirty = False
         return drawn
\ No newline at end of file
@@ -3,7 +3,7 @@
 This module consists of the EventHandler class, which is used to assign
 callbacks to events and keypresses in Pygame.
 
-Release: 12.
+Release: 13.
 
 Licensed under the GNU General Public License, version 3; if this was not
 included, you can find it here:
@@ -30,6 +30,32 @@ def quit (event):
     pygame.quit()
     sys.exit()
 
+class PygameSource (object):
+    """The default input source, which reads input from Pygame.
+
+An input source is any object with a get method like this one; set the
+module's source attribute to use a different one (to record or play back
+input, for example).
+
+"""
+
+    def get (self):
+        """Get input for a frame.
+
+get() -> (events, mods, pressed)
+
+events: a list of new events, as returned by pygame.event.get.
+mods: the held key modifiers, as returned by pygame.key.get_mods.
+pressed: the keys being held, as returned by pygame.key.get_pressed.
+
+"""
+        mods = pygame.key.get_mods()
+        events = pygame.event.get()
+        return (events, mods, pygame.key.get_pressed())
+
+# where EventHandler.update gets input from
+source = PygameSource()
+
 class EventHandler:
     """Assign callbacks to events and keypresses.
 
@@ -90,6 +116,8 @@ MODE_ONDOWN_REPEAT: as MODE_ONDOWN, but call the callback repeatedly when
 
 Frames, here, are the number of calls to EventHandler.update.
 
+Input is read through the module's source attribute (see PygameSource).
+
 Note that the callbacks associated with any given key are not called more than
 once per frame, even if the key is pressed more than once in the last frame
 (could happen with a mode other than MODE_HELD).
@@ -245,9 +273,9 @@ Call this every frame.
         down_mods = {}
         self.keys_up = set()
         up_mods = {}
-        pressed_mods = pygame.key.get_mods()
+        events, pressed_mods, pressed = source.get()
         # call event callbacks and compile keypresses
-        for event in pygame.event.get():
+        for event in events:
             if event.type in self.event_handlers:
                 cbs = self.event_handlers[event.type]
                 # call callbacks registered for this event type
@@ -265,7 +293,6 @@ Call this every frame.
                 else:
                     self.keys_up.add(event.key)
                     up_mods[event.key] = event.mod
-        pressed = pygame.key.get_pressed()
         # form some reason this is faster than set(genexpr)
         self.keys_pressed = set([i for i in xrange(len(pressed)) if pressed[i]])
         # update repeated key counts
@@ -0,0 +1,165 @@
+"""Frame profiler by J.
+
+This module provides a Profiler class to time named sections of code over many
+frames and summarise the results.
+
+Release: 1.
+
+Licensed under the GNU General Public License, version 3; if this was not
+included, you can find it here:
+    http://www.gnu.org/licenses/gpl-3.0.txt
+
+"""
+
+import os
+import time
+from collections import deque
+
+# time.clock has much better resolution on Windows
+timer = time.clock if os.name == 'nt' else time.time
+
+class Profiler (object):
+    """Time named sections of code.
+
+Profiler(enabled = True, history = 300, trace_size = 10000)
+
+enabled: whether to record anything; if False, all timing methods return
+         straight away.
+history: number of timings to keep for each section (and so, to compute
+         statistics from).
+trace_size: number of timings to keep for Profiler.dump.
+
+Sections are timed with Profiler.start and Profiler.stop, which can be nested
+(as long as they have different names).  Call Profiler.frame once per frame to
+number the timings in the trace.
+
+    METHODS
+
+start
+stop
+frame
+sections
+percentile
+stats
+dump
+clear
+
+    ATTRIBUTES
+
+enabled: as given; may be changed at any time.
+history: as given.
+frame_num: the number of calls to Profiler.frame.
+times: {name: timings} dict, where timings is a deque of the last history
+       durations, in seconds.
+trace: a deque of (frame_num, name, start, duration) tuples for the last
+       trace_size timings.
+
+"""
+
+    def __init__ (self, enabled = True, history = 300, trace_size = 10000):
+        self.enabled = enabled
+        self.history = history
+        self.frame_num = 0
+        self.times = {}
+        self.trace = deque(maxlen = trace_size)
+        self._started = {}
+        self._order = []
+
+    def start (self, name):
+        """Start timing the section with the given name."""
+        if self.enabled:
+            self._started[name] = timer()
+
+    def stop (self, name):
+        """Stop timing the section with the given name and record the time.
+
+Does nothing if the section wasn't started.
+
+"""
+        if self.enabled:
+            t = timer()
+            try:
+                t0 = self._started.pop(name)
+            except KeyError:
+                return
+            try:
+                times = self.times[name]
+            except KeyError:
+                times = self.times[name] = deque(maxlen = self.history)
+                self._order.append(name)
+            times.append(t - t0)
+            self.trace.append((self.frame_num, name, t0, t - t0))
+
+    def frame (self):
+        """Mark the end of a frame."""
+        if self.enabled:
+            self.frame_num += 1
+
+    def sections (self):
+        """Get a list of section names, in the order first timed."""
+        return list(self._order)
+
+    def percentile (self, name, p):
+        """Get a percentile of the recent timings for a section.
+
+percentile(name, p) -> t
+
+name: the section name.
+p: the percentile to get, from 0 to 100.
+
+t: the time in seconds, or None if the section has no timings.
+
+"""
+        times = sorted(self.times.get(name, ()))
+        if not times:
+            return None
+        return times[min(int(len(times) * p / 100.), len(times) - 1)]
+
+    def stats (self, percentiles = (50, 90, 99)):
+        """Summarise recent timings for all sections.
+
+stats(percentiles = (50, 90, 99)) -> summary
+
+percentiles: the percentiles to compute.
+
+summary: a list of (name, n, mean, values, max) tuples, one for each section in
+         the order returned by Profiler.sections, where n is the number of
+         timings and values is a list of the requested percentiles.  Times are
+         in seconds.
+
+"""
+        summary = []
+        for name in self._order:
+            times = sorted(self.times[name])
+            n = len(times)
+            values = [times[min(int(n * p / 100.), n - 1)]
+                      for p in percentiles]
+            summary.append((name, n, sum(times) / n, values, times[-1]))
+        return summary
+
+    def dump (self, fn):
+        """Write the trace to a file.
+
+The format is JSON if fn ends in '.json', else CSV with a header line.  Each
+record has frame, section, start and duration fields, with times in seconds.
+
+"""
+        fields = ('frame', 'section', 'start', 'duration')
+        with open(fn, 'w') as f:
+            if fn.lower().endswith('.json'):
+                import json
+                json.dump([dict(zip(fields, r)) for r in self.trace], f,
+                          indent = 0)
+            else:
+                import csv
+                w = csv.writer(f)
+                w.writerow(fields)
+                w.writerows(self.trace)
+
+    def clear (self):
+        """Forget all timings."""
+        self.frame_num = 0
+        self.times = {}
+        self.trace.clear()
+        self._started = {}
+        self._order = []
@@ -14,7 +14,7 @@ compress as a string of characters in the known range.  If they're large, join
 them by some separator (' ', say) and compress as a string of characters in
 '0123456789 '.
 
-Release: 1.
+Release: 2.
 
 Licensed under the GNU General Public License, version 3; if this was not
 included, you can find it here:
@@ -40,7 +40,6 @@ byte_chars: list of characters in Python bytestrings (length 256)
 """
 
 import string
-from math import log
 from itertools import takewhile
 
 printable = [c for c in string.printable if c not in string.whitespace]
@@ -82,8 +81,11 @@ base: the base of the digits in l.
 x: base-10 integer.
 
 """
-    n = len(l)
-    return sum(d * base ** (n - i - 1) for i, d in enumerate(l))
+    # Horner's method: avoids computing a large power for every digit
+    x = 0
+    for d in l:
+        x = x * base + d
+    return x
 
 def base_10_to_b (x, base):
     """Convert a base-10 integer to a list a digits in the given base.
@@ -93,13 +95,12 @@ base_10_to_b(x, base) -> l
 The reverse of base_b_to_10.
 
 """
-    # append digits from high to low
+    # get digits from low to high, then reverse
     l = []
-    if x != 0:
-        for i in xrange(int(log(x) / log(base)), -1, -1):
-            order = base ** i
-            l.append(x / order)
-            x %= order
+    while x:
+        x, d = divmod(x, base)
+        l.append(d)
+    l.reverse()
     return l
 
 def convert_x_base (x, base1, base2):
@@ -11,6 +11,8 @@ included, you can find it here:
 
 """
 
+from bisect import bisect
+
 from pygame.display import get_surface
 from pygame.draw import line as draw_line
 from pygame import Rect
@@ -110,6 +112,11 @@ mode: one of:
                                height = width.
     ('grid', width[, height]): give entire grid these dimensions; if not given,
                                height = width.
+    ('view', width[, height]): like 'fit', but tiles are never smaller than
+                               these dimensions (if not given, height = width);
+                               if they would be, tiles are this size and only
+                               as many as fit are drawn, showing the part of
+                               the grid at the view attribute.
 align: (x, y) grid alignment or one int for x = y, where for each:
     < 0: left/top;
     0: centre;
@@ -139,6 +146,9 @@ draw
 change
 draw_changed
 reset
+scroll_to
+tile_at
+tile_rect
 
     ATTRIBUTES
 
@@ -162,6 +172,20 @@ draw_tile:
     if you want the new draw method to affect all tiles immediately rather than
     just as they are changed, call Tiler.reset.
 
+The following attributes are for the 'view' mode:
+
+view:
+    [column, row] of the top-left tile shown; this is kept inside the grid.
+    Tiler.draw_changed moves what was already drawn when this changes, and
+    only draws tiles that weren't shown before.
+shown:
+    (columns, rows) of tiles shown, as of the last draw (this is (w, h) in
+    other modes); do not change.
+drawn:
+    (column, row) tuples for the tiles drawn by the last call to
+    Tiler.draw_changed, including any newly shown by scrolling, or None if it
+    drew everything; do not change.
+
 """
         self.w = w
         self.h = h
@@ -189,7 +213,7 @@ draw_tile:
         else:
             self.border = border
         self.line = line
-        if mode[0] in ('tile', 'grid') and len(mode) == 2:
+        if mode[0] in ('tile', 'grid', 'view') and len(mode) == 2:
             mode = tuple(mode) + (mode[1],)
         self.mode = mode
         try:
@@ -201,6 +225,10 @@ draw_tile:
         self.offset = offset
         self.homogeneous = homogeneous
         self.overflow = overflow
+        self.view = [0, 0]
+        self._focus = None
+        self._drawn_view = None
+        self.drawn = []
         self.reset()
         self._tile_rects = None
         self._cache = {}
@@ -220,20 +248,56 @@ draw_tile:
             tl[i] += self.offset[i]
         return tl
 
+    def _set_shown (self, shown):
+        # set the number of tiles shown and the non-tile area on each axis
+        self.shown = tuple(shown)
+        self._lines = [self.gap[i] * (shown[i] - 1) + 2 * self.border[i]
+                       for i in (0, 1)]
+
+    def _follow (self):
+        # keep the view in the grid, and showing the tile given to scroll_to
+        for i in (0, 1):
+            shown = self.shown[i]
+            v = self.view[i]
+            if self._focus is not None:
+                tile, margin = self._focus
+                margin = min(margin, (shown - 1) / 2)
+                v = min(v, tile[i] - margin)
+                v = max(v, tile[i] + margin - shown + 1)
+            self.view[i] = max(0, min(v, (self.w, self.h)[i] - shown))
+
+    def _view_size (self, ws, hs):
+        # return grid rect on surface for the 'view' mode when not all tiles
+        # fit: show as many tiles of the minimum size as fit
+        sizes = self.mode[1:]
+        shown = []
+        for i in (0, 1):
+            space = (ws, hs)[i] - 2 * self.border[i] + self.gap[i]
+            n = int(space / (sizes[i] + self.gap[i]))
+            shown.append(max(min(n, (self.w, self.h)[i]), 1))
+        self._set_shown(shown)
+        self._follow()
+        w = shown[0] * int(sizes[0]) + self._lines[0]
+        h = shown[1] * int(sizes[1]) + self._lines[1]
+        return self._align((ws, hs), (w, h)) + [w, h]
+
     def _grid_size (self, ws, hs):
         # return grid rect on surface
         # calculate dimensions
+        self._set_shown((self.w, self.h))
         m = self.mode
         if m == 'stretch':
             w = ws
             h = hs
-        elif m in ('fit', 'zoom'):
+        elif m in ('fit', 'zoom') or m[0] == 'view':
             # calculate tile dimensions that fit
             choose_big = m == 'zoom'
             x = (ws - self._lines[0]) / float(self.w)
             y = (hs - self._lines[1]) / float(self.h)
             # then choose the right one
             size = (x, y)[choose_big ^ (x > y)]
+            if m[0] == 'view' and (size < m[1] or size < m[2]):
+                return self._view_size(ws, hs)
             w = int(round(size * self.w + self._lines[0]))
             h = int(round(size * self.h + self._lines[1]))
         elif m[0] == 'tile':
@@ -242,10 +306,13 @@ draw_tile:
         elif m[0] == 'grid':
             w = int(m[1])
             h = int(m[2])
+        # everything is shown
+        self._follow()
         return self._align((ws, hs), (w, h)) + [w, h]
 
     def _tile_sizes (self, surface_size, grid_rect):
         # calculate tile sizes for a given grid rect
+        cols, rows = self.shown
         ws, hs = surface_size
         l, t, w, h = grid_rect
         calc = True
@@ -255,7 +322,7 @@ draw_tile:
             h -= self._lines[1]
             calc = False
             # integer division
-            tile_sizes = [w / self.w, h / self.h]
+            tile_sizes = [w / cols, h / rows]
             w_prev = w
             h_prev = h
             if self.overflow in ('grow', 'crop'):
@@ -268,8 +335,8 @@ draw_tile:
                 calc = True
             else:
                 # get new grid position if necessary
-                w = self.w * tile_sizes[0]
-                h = self.h * tile_sizes[1]
+                w = cols * tile_sizes[0]
+                h = rows * tile_sizes[1]
                 if w != w_prev or h != h_prev:
                     w += self._lines[0]
                     h += self._lines[1]
@@ -280,8 +347,8 @@ draw_tile:
         if calc:
             # calculate individual row and col sizes
             tiles_size = (w - self._lines[0], h - self._lines[1])
-            x = tiles_size[0] / float(self.w)
-            y = tiles_size[1] / float(self.h)
+            x = tiles_size[0] / float(cols)
+            y = tiles_size[1] / float(rows)
             tile_sizes = []
             for i in (0, 1):
                 avg = (x, y)[i]
@@ -289,7 +356,7 @@ draw_tile:
                 diff = avg - base
                 sizes = []
                 total_diff = 0
-                for j in xrange((self.w, self.h)[i]):
+                for j in xrange(self.shown[i]):
                     total_diff += diff
                     if total_diff >= 1:
                         sizes.append(base + 1)
@@ -300,8 +367,8 @@ draw_tile:
                 sizes[0] += tiles_size[i] - sum(sizes)
                 tile_sizes.append(sizes)
             if self.homogeneous and self.overflow == 'crop':
-                tile_sizes[0] = [hg_tile_sizes[0]] * self.w
-                tile_sizes[1] = [hg_tile_sizes[1]] * self.h
+                tile_sizes[0] = [hg_tile_sizes[0]] * cols
+                tile_sizes[1] = [hg_tile_sizes[1]] * rows
                 for i in (0, 1):
                     n = 0
                     tile_size = hg_tile_sizes[i]
@@ -341,9 +408,13 @@ draw_tile:
         hg = type(tile_sizes[0]) is int
         b = self.border
         g = self.gap
+        vx, vy = self.view
+        cols, rows = self.shown
         x = l + b[0]
         if tiles:
-            # draw some tiles
+            # draw some tiles: those shown, relative to the view
+            tiles = [(i - vx, j - vy) for i, j in tiles
+                     if 0 <= i - vx < cols and 0 <= j - vy < rows]
             y = t + b[1]
             last_i = last_j = 0
             for i, j in sorted(tiles):
@@ -359,19 +430,20 @@ draw_tile:
                     y += sum(tile_sizes[1][last_j:j]) + g[1] * (j - last_j)
                     w = w[i]
                     h = h[j]
-                self._draw_tile_wrapper(surface, (x, y, w, h), i, j)
+                self._draw_tile_wrapper(surface, (x, y, w, h), i + vx, j + vy)
                 last_i = i
                 last_j = j
         else:
             # draw all tiles
-            for i in xrange(self.w):
+            for i in xrange(cols):
                 y = t + b[1]
-                for j in xrange(self.h):
+                for j in xrange(rows):
                     w, h = tile_sizes
                     if not hg:
                         w = w[i]
                         h = h[j]
-                    self._draw_tile_wrapper(surface, (x, y, w, h), i, j)
+                    self._draw_tile_wrapper(surface, (x, y, w, h), i + vx,
+                                            j + vy)
                     y += h + g[1]
                 x += w + g[0]
 
@@ -397,7 +469,7 @@ draw_tile:
                 end = tl[i] + (h, w)[i] - b[not i] - 1
                 if not hg:
                     max_size = tile_sizes[i][0]
-                for j in xrange((self.w, self.h)[i] - 1):
+                for j in xrange(self.shown[i] - 1):
                     tile_size = tile_sizes[i]
                     if not hg:
                         if crop and tile_sizes[i][j] < max_size:
@@ -410,6 +482,76 @@ draw_tile:
                         draw_line(surface, c, (pos, start), (pos, end), g[i])
                     pos += g[i]
 
+    def _layout (self, surface, size):
+        # get (surface, tile_sizes, grid_rect) for drawing, where the
+        # arguments are as taken by draw
+        if surface is None:
+            surface = get_surface()
+        if size is not None:
+            ws, hs = size[:2]
+        else:
+            ws, hs = surface.get_size()
+        # purge cache if surface size has changed
+        if (ws, hs) != self._cache_dim:
+            self._cache = {}
+            self._cache_dim = (ws, hs)
+        # compute
+        l, t, w, h = self._call_cacheable('_grid_size', ws, hs)
+        tile_sizes, (l, t, w, h) = self._call_cacheable('_tile_sizes',
+                                                        (ws, hs), (l, t, w, h))
+        return surface, tile_sizes, (l, t, w, h)
+
+    def _scroll (self, surface, size):
+        # move what was drawn for the last view to where it is in the current
+        # view; returns (rect, tiles), where rect is the area changed and tiles
+        # are those that still need to be drawn
+        surface, tile_sizes, (l, t, w, h) = self._layout(surface, size)
+        b = self.border
+        rect = Rect(l + b[0], t + b[1], w - 2 * b[0], h - 2 * b[1])
+        old = self._drawn_view
+        vx, vy = self.view
+        cols, rows = self.shown
+        # scrolling only happens when tiles are the minimum size, so they're
+        # all the same size
+        steps = [sizes if type(sizes) is int else sizes[0]
+                 for sizes in tile_sizes]
+        dx, dy = [old[i] - self.view[i] for i in (0, 1)]
+        if abs(dx) < cols and abs(dy) < rows:
+            clip = surface.get_clip()
+            surface.set_clip(rect)
+            surface.scroll(dx * (steps[0] + self.gap[0]),
+                           dy * (steps[1] + self.gap[1]))
+            surface.set_clip(clip)
+            # gaps stay in the same place, so only tiles newly shown need
+            # drawing
+            shown = lambda i, j: (0 <= i - old[0] < cols and
+                                  0 <= j - old[1] < rows)
+            tiles = [(i, j) for i in xrange(vx, vx + cols)
+                     for j in xrange(vy, vy + rows) if not shown(i, j)]
+        else:
+            tiles = [(i, j) for i in xrange(vx, vx + cols)
+                     for j in xrange(vy, vy + rows)]
+        self._drawn_view = list(self.view)
+        return rect, tiles
+
+    def scroll_to (self, tile, margin = 0):
+        """Keep a tile shown in the 'view' mode.
+
+scroll_to(tile, margin = 0)
+
+tile: (column, row) tuple, or None to stop following a tile.
+margin: the number of tiles to keep shown between the tile and the edge of the
+        view, where possible.
+
+The view is moved as little as possible, now and whenever the number of tiles
+shown changes, until this is called again.
+
+"""
+        self._focus = None if tile is None else (tuple(tile), margin)
+        if '_grid_size' in self._cache:
+            # know how many tiles are shown
+            self._follow()
+
     def draw (self, surface = None, *tiles, **kw):
         """Draw grid to a surface.
 
@@ -424,20 +566,8 @@ size (keyword-only): work out the grid size using this (width, height) target
 rect: (left, top, width, height) rectangle representing the grid.
 
 """
-        if surface is None:
-            surface = get_surface()
-        if 'size' in kw and kw['size'] is not None:
-            ws, hs = kw['size'][:2]
-        else:
-            ws, hs = surface.get_size()
-        # purge cache if surface size has changed
-        if (ws, hs) != self._cache_dim:
-            self._cache = {}
-            self._cache_dim = (ws, hs)
-        # compute
-        l, t, w, h = self._call_cacheable('_grid_size', ws, hs)
-        tile_sizes, (l, t, w, h) = self._call_cacheable('_tile_sizes',
-                                                        (ws, hs), (l, t, w, h))
+        surface, tile_sizes, (l, t, w, h) = self._layout(surface,
+                                                         kw.get('size'))
         # draw
         self._draw_tiles(surface, tile_sizes, t, l, *tiles)
         if tiles:
@@ -449,9 +579,83 @@ rect: (left, top, width, height) rectangle representing the grid.
         else:
             self._draw_lines(surface, (l, t, w, h), tile_sizes)
             self._changed = set()
+            self._drawn_view = list(self.view)
         # return rect grid is in
         return (l, t, w, h)
 
+    def _tile_bounds (self):
+        # (starts, ends) of tiles on each axis for the last grid drawn
+        tile_sizes, (l, t, w, h) = self._cache['_tile_sizes']
+        bounds = []
+        for i, n in enumerate(self.shown):
+            sizes = tile_sizes[i]
+            if type(sizes) is int:
+                sizes = [sizes] * n
+            pos = (l, t)[i] + self.border[i]
+            starts = []
+            ends = []
+            for size in sizes:
+                starts.append(pos)
+                ends.append(pos + size)
+                pos += size + self.gap[i]
+            bounds.append((starts, ends))
+        return bounds
+
+    def tile_at (self, p):
+        """Get the tile containing a point, as last drawn.
+
+Tiler.tile_at(p) -> tile
+
+p: (x, y) point on the surface drawn to.
+
+tile: (column, row) tuple, False if the point is in the grid but not in a tile
+      (on a border or in a gap), or None if the point is outside the grid or
+      the grid hasn't been drawn since the cache was last purged.
+
+This works for tiles of any size, and takes time logarithmic in the number of
+rows and columns.
+
+"""
+        try:
+            l, t, w, h = self._cache['_tile_sizes'][1]
+        except KeyError:
+            return None
+        if not (l <= p[0] < l + w and t <= p[1] < t + h):
+            return None
+        bounds = self._call_cacheable('_tile_bounds')
+        tile = []
+        for i in (0, 1):
+            starts, ends = bounds[i]
+            j = bisect(starts, p[i]) - 1
+            if j < 0 or p[i] >= ends[j]:
+                return False
+            tile.append(j + self.view[i])
+        return tuple(tile)
+
+    def tile_rect (self, tile):
+        """Get the rect a tile was last drawn in.
+
+Tiler.tile_rect(tile) -> rect
+
+tile: (column, row) tuple.
+
+rect: (left, top, width, height) tuple, or None if the tile isn't shown or the
+      grid hasn't been drawn since the cache was last purged.
+
+"""
+        if '_tile_sizes' not in self._cache:
+            return None
+        bounds = self._call_cacheable('_tile_bounds')
+        rect = []
+        for i in (0, 1):
+            starts, ends = bounds[i]
+            j = tile[i] - self.view[i]
+            if not 0 <= j < self.shown[i]:
+                return None
+            rect.append(starts[j])
+            rect.append(ends[j] - starts[j])
+        return (rect[0], rect[2], rect[1], rect[3])
+
     def _draw_tile_wrapper (self, surface, rect, i, j):
         # used to store drawn tile rects for draw_changed to return
         if self._tile_rects is not None:
@@ -499,12 +703,26 @@ drawn, None is returned.  If some tiles were drawn, a list of rects is
 returned, with the first the grid rect and all subsequent ones the redrawn
 tiles.
 
+If the view has moved since it was last drawn (see the 'view' mode), what was
+drawn is moved with it and only the newly shown tiles are drawn, so the cost
+depends on the area drawn to rather than the size of the grid; the area moved
+is included in the returned rects.
+
 """
         if self._changed is None:
+            self.drawn = None
             return self.draw(surface, size = size)
-        elif self._changed:
+        scrolled = self._drawn_view not in (None, self.view)
+        self.drawn = []
+        if self._changed or scrolled:
             self._tile_rects = []
-            rect = self.draw(surface, *self._changed, size = size)
+            tiles = list(self._changed)
+            if scrolled:
+                rect, new = self._scroll(surface, size)
+                self._tile_rects.append(rect)
+                tiles += new
+            self.drawn = tiles
+            rect = self.draw(surface, *tiles, size = size)
             temp = self._tile_rects
             self._tile_rects = None
             return [rect] + temp
@@ -512,9 +730,7 @@ tiles.
     def reset (self):
         """Reset some stuff."""
         # calculate total non-tile area on grid in each dimension
-        size = (self.w, self.h)
-        self._lines = [self.gap[i] * (size[i] - 1) + 2 * self.border[i]
-                       for i in (0, 1)]
+        self._set_shown((self.w, self.h))
         # tell draw_changed to draw everything
         self._changed = None
         # purge cached results
@@ -0,0 +1,145 @@
+"""Brain Requirement Just A Formality.  Copyright 2011 by J.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+
+"""
+
+class Journal (object):
+    """A history of changes for undo and redo.
+
+Journal(limit = 0)
+
+limit: the maximum number of steps to keep; the oldest are forgotten when this
+       is exceeded.  If 0, there is no limit.
+
+Changes are records (any objects; the journal doesn't look at them) grouped
+into steps, where a step is what Journal.undo and Journal.redo act on.  Each
+call to Journal.record makes a new step, unless a transaction is open (see
+Journal.begin), in which case records are added to the transaction's step.
+
+Recording, undoing and redoing all take constant time (recording after undoing
+also discards the undone steps).
+
+    METHODS
+
+record
+begin
+end
+undo
+redo
+rewind
+clear
+
+    ATTRIBUTES
+
+limit: as given.
+position: the number of steps that are currently applied, counted from the
+          oldest step that hasn't been forgotten.
+forgotten: the number of steps forgotten because of the limit since the
+           journal was created or cleared.
+size: the number of steps in the journal, including undone steps.
+
+"""
+
+    def __init__ (self, limit = 0):
+        self.limit = limit
+        self.clear()
+
+    def clear (self):
+        """Forget all steps."""
+        # steps are lists of records; self._steps[self._start:] are current
+        self._steps = []
+        self._start = 0
+        self._end = 0
+        self._open = 0
+        self.forgotten = 0
+
+    @property
+    def position (self):
+        return self._end - self._start
+
+    @property
+    def size (self):
+        return len(self._steps) - self._start
+
+    def record (self, *records):
+        """Add records, in the order they were made."""
+        if not records:
+            return
+        steps = self._steps
+        if self._open and self._open_step is not None:
+            self._open_step.extend(records)
+            return
+        # discard undone steps
+        if self._end < len(steps):
+            del steps[self._end:]
+        step = list(records)
+        steps.append(step)
+        self._end += 1
+        if self._open:
+            self._open_step = step
+        # forget oldest step if need to
+        if self.position > self.limit > 0:
+            steps[self._start] = None
+            self._start += 1
+            self.forgotten += 1
+            if self._start > len(steps) / 2:
+                # compact
+                del steps[:self._start]
+                self._end -= self._start
+                self._start = 0
+
+    def begin (self):
+        """Start a transaction: records until the matching Journal.end form one
+step.
+
+Transactions may be nested, in which case the outermost one makes the step.
+
+"""
+        if not self._open:
+            self._open_step = None
+        self._open += 1
+
+    def end (self):
+        """End a transaction started with Journal.begin."""
+        if self._open:
+            self._open -= 1
+
+    def undo (self):
+        """Move back a step.
+
+Returns the step's records in reverse order (the order to undo them in), or
+None if there is nothing to undo.  Any open transactions are ended first.
+
+"""
+        self._open = 0
+        if self._end == self._start:
+            return None
+        self._end -= 1
+        return self._steps[self._end][::-1]
+
+    def redo (self):
+        """Move forward a step.
+
+Returns the step's records in the order they were made, or None if there is
+nothing to redo.  Any open transactions are ended first.
+
+"""
+        self._open = 0
+        if self._end == len(self._steps):
+            return None
+        self._end += 1
+        return list(self._steps[self._end - 1])
+
+    def rewind (self):
+        """Move back to before the oldest step without undoing anything.
+
+This is for when the caller can restore that state itself more quickly.  Undone
+steps can still be redone.  Any open transactions are ended first.
+
+"""
+        self._open = 0
+        self._end = self._start
@@ -10,7 +10,6 @@ version.
 import os
 from math import ceil
 from time import time
-from random import random, choice
 from bisect import bisect
 
 import pygame
@@ -26,23 +25,6 @@ import conf
 # - hard to move diagonally
 # - fix the fact that autosolving doesn't wait until the level's won before resetting (breaks levels that don't get to the goal for some time longer)
 
-def get_levels (ID = False):
-    """Get a list of existing levels.
-
-Takes a boolean determining whether to load custom levels.
-
-"""
-    d = (conf.LEVEL_DIR_MAIN, conf.LEVEL_DIR_CUSTOM, conf.LEVEL_DIR_DRAFT)[ID]
-    try:
-        es = (OSError, WindowsError)
-    except NameError:
-        es = OSError
-    try:
-        fs = os.listdir(d)
-    except es:
-        return []
-    return sorted(f for f in fs if os.path.isfile(d + f))
-
 def defn_wins (defn):
     """Check if the given definition starts in a winning state."""
     lvl = Level(definition = defn, sound = False)
@@ -52,6 +34,78 @@ def defn_wins (defn):
     return lvl.won
 
 
+def parse_soln (soln, speed = conf.SOLVE_SPEED):
+    """Parse a solution string.
+
+parse_soln(soln, speed = conf.SOLVE_SPEED) -> parsed
+
+soln: the solution, in the format found in level definitions.
+speed: the wait to use where none is given, and the preferred wait where a
+       range is given.
+
+parsed: a list alternating between waits and moves, starting with a wait.  Waits
+        are (held_directions, frames) tuples and moves are lists of directions.
+
+"""
+    parsed = []
+    for i, s in enumerate(soln.split(',')):
+        s = s.strip()
+        if i % 2:
+            # directions
+            s = [conf.SOLN_DIRS.index(c) for c in s]
+        else:
+            # time delay
+            if s.startswith('['):
+                # got keys to hold for this waiting period
+                end = s.find(']')
+                hold = [conf.SOLN_DIRS.index(c) for c in s[1:end]]
+                s = s[end + 1:].strip()
+            else:
+                hold = ()
+            ops = ('>', '<')
+            if any(op in s for op in ops):
+                # minimum and maximum values
+                allowed_range = [None, None]
+                while s:
+                    # check for < and > being first
+                    for op in ops:
+                        if s.startswith(op):
+                            s = s[1:].strip()
+                            eq = s.startswith('=')
+                            if eq:
+                                # remove = if found
+                                s = s[1:].strip()
+                        else:
+                            # op is not the first operator
+                            continue
+                        # the number is everything up to the next operator
+                        next_op = len(s)
+                        for o in ops:
+                            j = s.find(o)
+                            # or the end of the string
+                            if j == -1:
+                                j = len(s)
+                            next_op = min(j, next_op)
+                        val = int(s[:next_op])
+                        val = int(val)
+                        # add/subtract one if >/<
+                        val += (-1 if op == '<' else 1) * (1 - eq)
+                        allowed_range[ops.index(op)] = val
+                        s = s[next_op:].strip()
+                # constrain by given conditions
+                gt, lt = allowed_range
+                s = speed
+                if gt is not None:
+                    s = max(s, gt)
+                if lt is not None:
+                    s = min(s, lt)
+            else:
+                s = int(s) if s else speed
+            s = (hold, s)
+        parsed.append(s)
+    return parsed
+
+
 class PauseMenu (menu.Menu):
     """The standard pause menu when playing a level.
 
@@ -63,7 +117,7 @@ Takes the LevelBackend instance.
         # choose help message:
         # get data for weightings
         time = level.pause_time
-        solved = conf.get('solve_methods', [])[:conf.SOLVE_HISTORY_SIZE]
+        solved = list(conf.SOLVE_METHODS)
         solved.reverse()
         num_solved = len(solved)
         if num_solved < conf.HELP_MSG_MIN_SOLVED:
@@ -89,11 +143,12 @@ Takes the LevelBackend instance.
         for w in weightings:
             last += w
             cumulative.append(last)
-        index = bisect(cumulative, cumulative[-1] * random())
+        rng = self.game.rng
+        index = bisect(cumulative, cumulative[-1] * rng.random())
         index = min(index, len(pool_names) - 1)
         pool = conf.HELP_MSG_POOLS[pool_names[index]]
         # choose message from pool (not weighted)
-        help_msg = choice(pool)
+        help_msg = rng.choice(pool)
 
         # create menu
         if level.solving:
@@ -145,7 +200,7 @@ class Level (object):
 
     CONSTRUCTOR
 
-Level([event_handler][, ID][, definition][, win_cb], sound = True)
+Level([event_handler][, ID][, definition][, win_cb], sound = True[, seed])
 
 event_handler: evthandler.EventHandler instance to use for keybindings.  If not
                given, the level cannot be controlled by the keyboard.
@@ -154,6 +209,8 @@ definition: a level definition to use; see the puzzle module for details.
 win_cb: function to call when the player wins, or (function, *args) to pass
         some arguments to the function.
 sound: whether to play sounds.
+seed: seed for the puzzle's random number generator, used whenever a level is
+      loaded.  If not given, it comes from the game's generator, if any.
 
 One of ID and definition is required.
 
@@ -180,6 +237,8 @@ won: whether the level has been won.
 solving: whether the puzzle is currently being solved.
 solving_index: the current step in the solution being used to solve the puzzle.
 solutions: a list of solutions to the level.
+rng: the puzzle's random.Random instance.
+seed: as given.
 recording: whether input is currently being recorded.
 frozen: whether the solution being played back is paused.
 start_time: time the level started; this is altered when unpaused to give the
@@ -191,9 +250,10 @@ sound: as given.
 """
 
     def __init__ (self, event_handler = None, ID = None, definition = None,
-                  win_cb = None, sound = True):
+                  win_cb = None, sound = True, seed = None):
         if not hasattr(self, 'game'):
             self.game = None
+        self.seed = seed
         if event_handler is not None:
             # add gameplay key handlers
             args = (
@@ -226,6 +286,14 @@ sound: as given.
         else:
             self.win_cb = win_cb
 
+    @property
+    def rng (self):
+        return self.puzzle.rng
+
+    @property
+    def players (self):
+        return self.puzzle.blocks.of_type(conf.B_PLAYER)
+
     def load (self, ID = None, definition = None):
         """Load a level.
 
@@ -238,9 +306,8 @@ Takes ID and definition arguments as in the constructor.
             path = conf.LEVEL_DIR_CUSTOM if ID[0] else conf.LEVEL_DIR_MAIN
             with open(path + ID[1]) as f:
                 definition = f.read()
-        self.puzzle = Puzzle(self.game, definition, True, self.sound)
-        self.players = [b for b in self.puzzle.blocks
-                        if b.type == conf.B_PLAYER]
+        self.puzzle = Puzzle(self.game, definition, True, self.sound,
+                             self.seed)
         # store message and solutions
         lines = definition.split('\n')
         msgs = []
@@ -300,8 +367,6 @@ Takes ID and definition arguments as in the constructor.
         """Reset the level to its state after the last call to Level.load."""
         if not self.solving:
             self.puzzle.reset()
-            self.players = [b for b in self.puzzle.blocks
-                            if b.type == conf.B_PLAYER]
         # restart recording if want to
         if self.recording and self._blank_on_reset:
             self.start_recording()
@@ -319,64 +384,7 @@ Takes ID and definition arguments as in the constructor.
 
     def _parse_soln (self, ID, speed = conf.SOLVE_SPEED):
         """Parse a solution string and return the result."""
-        soln = self.solutions[ID]
-        parsed = []
-        for i, s in enumerate(soln.split(',')):
-            s = s.strip()
-            if i % 2:
-                # directions
-                s = [conf.SOLN_DIRS.index(c) for c in s]
-            else:
-                # time delay
-                if s.startswith('['):
-                    # got keys to hold for this waiting period
-                    end = s.find(']')
-                    hold = [conf.SOLN_DIRS.index(c) for c in s[1:end]]
-                    s = s[end + 1:].strip()
-                else:
-                    hold = ()
-                ops = ('>', '<')
-                if any(op in s for op in ops):
-                    # minimum and maximum values
-                    allowed_range = [None, None]
-                    while s:
-                        # check for < and > being first
-                        for op in ops:
-                            if s.startswith(op):
-                                s = s[1:].strip()
-                                eq = s.startswith('=')
-                                if eq:
-                                    # remove = if found
-                                    s = s[1:].strip()
-                            else:
-                                # op is not the first operator
-                                continue
-                            # the number is everything up to the next operator
-                            next_op = len(s)
-                            for o in ops:
-                                j = s.find(o)
-                                # or the end of the string
-                                if j == -1:
-                                    j = len(s)
-                                next_op = min(j, next_op)
-                            val = int(s[:next_op])
-                            val = int(val)
-                            # add/subtract one if >/<
-                            val += (-1 if op == '<' else 1) * (1 - eq)
-                            allowed_range[ops.index(op)] = val
-                            s = s[next_op:].strip()
-                    # constrain by given conditions
-                    gt, lt = allowed_range
-                    s = speed
-                    if gt is not None:
-                        s = max(s, gt)
-                    if lt is not None:
-                        s = min(s, lt)
-                else:
-                    s = int(s) if s else speed
-                s = (hold, s)
-            parsed.append(s)
-        return parsed
+        return parse_soln(self.solutions[ID], speed)
 
     def solve (self, solution = 0, stop_on_finish = True):
         """Solve the puzzle.
@@ -404,12 +412,10 @@ a bad idea to call this function while solving.
             self._solve_time_ff = self._solution_ff[0][1]
             self._finished_solving = False
             # store solve method
-            if self.ID is not None:
-                levels = conf.get('completed_levels', [])
-                if self.ID not in levels:
-                    solved = conf.get('solve_methods', [])
-                    solved.append(False)
-                    conf.set(solve_methods = solved)
+            if self.ID is not None and \
+               self.ID not in conf.COMPLETED_LEVELS:
+                conf.SOLVE_METHODS.append(False)
+                conf.set(solve_methods = conf.SOLVE_METHODS)
             # call this function again to act on the first instruction
             move = self.solve()
         elif i == len(self._solution):
@@ -576,16 +582,16 @@ Returns whether anything changed.
                 if win:
                     # save to disk
                     if not self.solving and self.ID is not None:
-                        levels = conf.get('completed_levels', [])
-                        if self.ID not in levels:
-                            levels.append(self.ID)
-                            conf.set(completed_levels = levels)
+                        if self.ID not in conf.COMPLETED_LEVELS:
+                            conf.COMPLETED_LEVELS.add(self.ID)
+                            # store solve method
+                            conf.SOLVE_METHODS.append(True)
+                            conf.set(
+                                completed_levels = conf.COMPLETED_LEVELS,
+                                solve_methods = conf.SOLVE_METHODS
+                            )
                             self.game.set_backend_attrs(menu.MainMenu,
                                                         're_init', True)
-                            # store solve method
-                            solved = conf.get('solve_methods', [])
-                            solved.append(True)
-                            conf.set(solve_methods = solved)
                     # call win callback
                     if self.win_cb is not None:
                         self.win_cb[0](*self.win_cb[1:])
@@ -9,7 +9,6 @@ version.
 
 import os
 from math import ceil
-from random import randrange, choice
 
 import pygame
 from ext import clipboard
@@ -776,15 +775,15 @@ ValueError).
         surface = self._surface(pzl)
         if screen is not None:
             # get position to draw at
-            tile = self.pos
-            rect = pzl.rect
-            border = pzl.tiler.border
+            rect = pzl.tiler.tile_rect(self.pos)
+            if rect is None:
+                # scrolled out of view
+                return
             gap = pzl.tiler.gap
             pos = []
             for i in (0, 1):
-                tile_size = pzl.tile_size(i)
-                x0 = rect[i] + border[i]
-                x0 += tile[i] * tile_size + (tile[i] - 1) * gap[i]
+                tile_size = rect[2 + i]
+                x0 = rect[i] - gap[i]
                 # adjust to look centred-ish (HACK)
                 pzls =  self.menu.grids.itervalues()
                 sizes = [[s[i] for s in p.text_adjust] for p in pzls]
@@ -1029,24 +1028,19 @@ widget: widget (Text instance) to refresh text for; defaults to all widgets on
             is_long = isinstance(widget, LongText)
             (x0, y0) = widget.pos
             puzzle = self.grids[page_ID]
-            # remove letters
-            for y in xrange(y0, y0 + widget.current_rows):
-                for x in xrange(x0, x0 + widget.size):
-                    b = puzzle.grid[x][y][1]
-                    if b is not None and (b.type > conf.MAX_ID or is_long):
+            if is_long:
+                # remove letters
+                for y in xrange(y0, y0 + widget.current_rows):
+                    for x in xrange(x0, x0 + widget.size):
                         puzzle.rm_block(None, x, y)
-                    if not is_long:
-                        # replace with original random block, if any
-                        try:
-                            puzzle.reset((x, y))
-                        except KeyError:
-                            pass
-            if not is_long:
+            else:
+                # replace letters with original random blocks, if any
+                puzzle.reset_region(x0, y0, widget.size, 1)
                 # add letters back
                 id_offset = widget.get_id_offset()
                 for x, c in enumerate(widget.text):
                     o = ord(c) + id_offset
-                    puzzle.add_block((BoringBlock, o), x0 + x, y)
+                    puzzle.add_block((BoringBlock, o), x0 + x, y0)
 
     def generate_access_keys (self):
         """Generate the access keys dict for keyboard control of menus.
@@ -1090,11 +1084,14 @@ blocks, surfaces: both ((col, row): ID) dicts for things in the puzzle.
                 i = 0
                 n = int(min(rand_ratio, 1) * self.grid_w * self.grid_h)
                 n = min(n, n - len(things))
+                rng = self.game.rng
                 while i < n:
-                    pos = (randrange(self.grid_w), randrange(self.grid_h))
+                    pos = (rng.randrange(self.grid_w),
+                           rng.randrange(self.grid_h))
                     x = xrange(min_ID, conf.MAX_ID + 1)
                     # exclude arrows so we can use them for paging
-                    type_ID = choice([j for j in x if j not in conf.S_ARROWS])
+                    type_ID = rng.choice([j for j in x
+                                          if j not in conf.S_ARROWS])
                     if pos not in things:
                         things[pos] = type_ID
                         i += 1
@@ -1464,20 +1461,106 @@ select_instance: the created Select instance.
         return s
 
 
-# both of these need Menu
-import level
-import editor
+class _Deferred (object):
+    """A module that is only imported when one of its attributes is used.
+
+_Deferred(load)
+
+load: a function that takes no arguments, imports the module and returns it.
+
+"""
+
+    def __init__ (self, load):
+        self._load = load
+
+    def __getattr__ (self, attr):
+        return getattr(self._load(), attr)
+
+
+def _import_level ():
+    import level
+    return level
+
+
+def _import_editor ():
+    import editor
+    return editor
+
+
+def _import_verify ():
+    import verify
+    return verify
+
+
+def _import_thumbnail ():
+    import thumbnail
+    return thumbnail
+
+# these need Menu, and none are needed for the first frame
+level = _Deferred(_import_level)
+editor = _Deferred(_import_editor)
+verify = _Deferred(_import_verify)
+thumbnail = _Deferred(_import_thumbnail)
+# thumbnail.Thumbnails shared by every MainMenu, since it starts threads;
+# created when first needed
+_thumbnails = None
+
+def get_levels (ID = False):
+    """Get a list of existing levels.
+
+Takes a boolean determining whether to load custom levels.
+
+"""
+    d = (conf.LEVEL_DIR_MAIN, conf.LEVEL_DIR_CUSTOM, conf.LEVEL_DIR_DRAFT)[ID]
+    try:
+        es = (OSError, WindowsError)
+    except NameError:
+        es = OSError
+    try:
+        fs = os.listdir(d)
+    except es:
+        return []
+    return sorted(f for f in fs if os.path.isfile(d + f))
+
+
+def _backend (module, cls):
+    """Get a function that starts a backend from a _Deferred module.
+
+_backend(module, cls) -> f
+
+module: _Deferred instance.
+cls: name of the backend class in module.
+
+f: a function to pass to Game.start_backend in place of the class; the module
+   is not imported until it is called.
+
+"""
+    return lambda *args: getattr(module, cls)(*args)
+
 
 class MainMenu (Menu):
     """The game's main menu."""
 
     def init (self):
+        if not hasattr(self, '_verifier'):
+            # first call
+            self._verifier = None
+            self._verify_progress = Text('', size = 7)
+            self.event_handler.add_event_handlers({
+                conf.EVENT_VERIFY: self._verified
+            })
+            self._thumbnail = None
+        if _thumbnails is not None:
+            # levels or the theme might have changed
+            _thumbnails.clear()
+        # {button: level file} for level select buttons
+        self._level_fns = {}
         # some shortcuts
         s = self._new_select
         g = lambda i: (conf.get, (i,))
         w = self._with_custom_lvl
         kb_layout_index = lambda: conf.KB_LAYOUTS.index(conf.KB_LAYOUT)
-        snd_theme_index = lambda: conf.SOUND_THEMES.index(conf.SOUND_THEME)
+        snd_theme_index = lambda: conf.sound_themes().index(conf.SOUND_THEME)
         theme_index = lambda: conf.THEMES.index(conf.THEME)
         pages = (
             (
@@ -1485,25 +1568,28 @@ class MainMenu (Menu):
                 Button('Custom', self.set_page, 2),
                 Button('Options', self.set_page, 13)
             ), [], (
-                Button('New', self.game.start_backend, editor.Editor),
+                Button('New', self.game.start_backend,
+                       _backend(editor, 'Editor')),
                 Button('Load', self.set_page, 3),
                 Button('Load draft', self.set_page, 4),
                 Button('From code', self.set_page, 8)
             ), [], [], (
                 (
-                    Button('Play', w, level.LevelBackend),
-                    Button('Edit', w, editor.Editor),
+                    Button('Play', w, _backend(level, 'LevelBackend')),
+                    Button('Edit', w, _backend(editor, 'Editor')),
                     Button('Share', self._share, 7)
                 ), (
-                    Button('Delete', w, editor.DeleteMenu, 1, None, self.back),
+                    Button('Delete', w, _backend(editor, 'DeleteMenu'), 1,
+                           None, self.back),
                     Button('Rename', self._rename),
                     Button('Duplicate', self._rename, False)
                 )
             ), (
                 (
-                    Button('Edit', w, editor.Editor),
+                    Button('Edit', w, _backend(editor, 'Editor')),
                     Button('Share', self._share, 7),
-                    Button('Delete', w, editor.DeleteMenu, 1, None, self.back)
+                    Button('Delete', w, _backend(editor, 'DeleteMenu'), 1,
+                           None, self.back)
                 ), (
                     Button('Rename', self._rename),
                     Button('Duplicate', self._rename, False)
@@ -1555,7 +1641,7 @@ class MainMenu (Menu):
                 s(RangeSelect, g('music_volume'), 'Music: %x', 0, 100),
                 s(RangeSelect, g('sound_volume'), 'Sound: %x', 0, 100),
                 s(DiscreteSelect, snd_theme_index, 'Theme: %x',
-                  conf.SOUND_THEMES, True),
+                  conf.sound_themes(), True),
                 Button('Save', self._save, (
                     ((16, 0), 'music_volume', self._update_music_vol),
                     ((16, 1), 'sound_volume', self._update_snd_vol),
@@ -1569,19 +1655,25 @@ class MainMenu (Menu):
                     ((17, 0), ('theme', False), self._refresh_graphics),
                     ((17, 1), 'fullscreen', self.game.refresh_display)
                 ))
+            ), (
+                Text('Checking'),
+                self._verify_progress,
+                Button('Cancel', self.back)
             )
         )
 
         # create level pages
         for page, custom in ((1, 0), (3, 1), (4, 2)):
-            lvls = level.get_levels(custom)
+            lvls = get_levels(custom)
+            d = (conf.LEVEL_DIR_MAIN, conf.LEVEL_DIR_CUSTOM,
+                 conf.LEVEL_DIR_DRAFT)[custom]
             page = pages[page]
             if not lvls:
                 # nothing to show
                 page.append(Text('Empty'))
                 continue
             if not custom:
-                completed = conf.get('completed_levels', [])
+                completed = conf.COMPLETED_LEVELS
                 uncompleted = [l for l in lvls if l not in completed]
                 uncompleted_to_show = conf.NUM_UNCOMPLETED_LEVELS
             # create columns
@@ -1605,9 +1697,11 @@ class MainMenu (Menu):
                             n %= len(lvls)
                             win_cb = (self._won_level, n)
                     b = Button(lvl, self.game.start_backend,
-                               level.LevelBackend, ID, None, level.PauseMenu,
-                               win_cb, special = lvl in completed)
+                               _backend(level, 'LevelBackend'), ID, None,
+                               _backend(level, 'PauseMenu'), win_cb,
+                               special = lvl in completed)
                 page[col].append(b)
+                self._level_fns[b] = d + lvl
                 if not custom and lvl not in completed:
                     # only show a few unfinished levels
                     uncompleted_to_show -= 1
@@ -1665,52 +1759,117 @@ class MainMenu (Menu):
             pass
         else:
             self.back()
-            # get rid of broken solutions
-            draft = True
-            if level.defn_wins(defn):
-                # starts winning, so no solutions are real solutions
-                draft = True
-                rm = range(len(lvl.solutions))
+            # check solutions in the background (see _verified)
+            self._verifier = verify.Verifier(defn, conf.EVENT_VERIFY)
+            self._verify_data = (page, action)
+            self.set_page(18)
+            self._update_verify_progress()
+
+    def _update_verify_progress (self):
+        """Show the progress of the running Verifier."""
+        v = self._verifier
+        text = '{0}/{1}'.format(v.done, '?' if v.total is None else v.total)
+        if text != self._verify_progress.text:
+            self._verify_progress.set_text(text)
+
+    def _verified (self, event):
+        """Callback for the running Verifier finishing."""
+        v = self._verifier
+        if v is None or event.ID != v.ID or not v.finished:
+            # cancelled
+            return
+        self._verifier = None
+        page, action = self._verify_data
+        del self._verify_data
+        self.back()
+        lvl, results = v.result
+        # get rid of broken solutions; if none work, save as draft
+        draft = not any(results)
+        defn = v.defn
+        rm = [i for i, works in enumerate(results) if not works]
+        if rm:
+            for i in reversed(rm):
+                lvl.solutions.pop(i)
+            defn = lvl.puzzle.definition()
+            if lvl.msg is not None:
+                defn += '\n@ ' + lvl.msg
+            if lvl.solutions:
+                defn += '\n' + '\n'.join(': ' + soln for soln in
+                                            lvl.solutions)
+        if action == 'play':
+            if draft:
+                self.set_page(page + 1)
             else:
-                # run the autosolver on the level for each solution
-                # if any fail, remove them; if none succeed, save as draft
-                lvl = level.Level(definition = defn, sound = False)
-                rm = []
-                for i in xrange(len(lvl.solutions)):
-                    lvl.solve(i)
-                    while lvl.solving:
-                        lvl.update()
-                    n = conf.POST_SOLVE_WAIT
-                    while n and lvl.update():
-                        n -= 1
-                    if lvl.won:
-                        draft = False
-                    else:
-                        # bad solution
-                        rm.append(i)
-                    lvl.load(definition = defn)
-            if rm:
-                for i in rm:
-                    lvl.solutions.pop(i)
-                defn = lvl.puzzle.definition()
-                if lvl.msg is not None:
-                    defn += '\n@ ' + lvl.msg
-                if lvl.solutions:
-                    defn += '\n' + '\n'.join(': ' + soln for soln in
-                                                lvl.solutions)
-            if action == 'play':
-                if draft:
-                    self.set_page(page + 1)
-                else:
-                    self.game.start_backend(level.LevelBackend, None, defn)
-            elif action == 'edit':
-                self.game.start_backend(editor.Editor, None, defn)
-            else: # save
-                self._save_shared_data = (draft, defn, page + 3)
-                if draft:
-                    self.set_page(page + 2)
-                else:
-                    self._continue_save_shared()
+                self.game.start_backend(level.LevelBackend, None, defn)
+        elif action == 'edit':
+            self.game.start_backend(editor.Editor, None, defn)
+        else: # save
+            self._save_shared_data = (draft, defn, page + 3)
+            if draft:
+                self.set_page(page + 2)
+            else:
+                self._continue_save_shared()
+
+    def update (self):
+        if self._verifier is not None:
+            if self.page_ID == 18:
+                self._update_verify_progress()
+            else:
+                # left the progress page: cancel
+                self._verifier.cancel()
+                self._verifier = None
+        Menu.update(self)
+
+    def _selected_level (self):
+        """Get the file for the selected level select button, if any."""
+        if self.sel is None:
+            return None
+        return self._level_fns.get(self.selected())
+
+    def _thumbnail_rect (self, screen, img):
+        """Get the rect to draw a level thumbnail in, or None if no room.
+
+It goes below the widgets, in the middle of the space left on the screen.
+
+"""
+        w, h = self.page_dim(self.page)
+        tile = ((self.grid_w - w) / 2, (self.grid_h - h) / 2 + h)
+        rect = self.grid.tiler.tile_rect(tile)
+        if rect is None:
+            return None
+        top = rect[1]
+        bottom = min(screen.get_height(), self.grid.rect.bottom)
+        rect = img.get_rect(center = (screen.get_width() / 2,
+                                      (top + bottom) / 2))
+        if rect.top < top or rect.left < 0:
+            return None
+        return rect
+
+    def draw (self, screen):
+        """Draw the menu and the selected level's thumbnail, if ready."""
+        fn = self._selected_level()
+        if fn is None:
+            img = None
+        else:
+            global _thumbnails
+            if _thumbnails is None:
+                _thumbnails = thumbnail.Thumbnails()
+            # ask for the others on the page too, after this one
+            img = _thumbnails.get(fn)
+            _thumbnails.request(*(self._level_fns[b]
+                                  for col in self.page for b in col
+                                  if b in self._level_fns))
+        if img is not self._thumbnail:
+            # clear the old one and draw the new one
+            self._thumbnail = img
+            self.dirty = True
+        drawn = Menu.draw(self, screen)
+        if drawn and img is not None:
+            rect = self._thumbnail_rect(screen, img)
+            if rect is not None:
+                screen.blit(img, rect)
+                drawn = list(drawn) + [rect]
+        return drawn
 
     def _done_rename (self, name, old_name, d, then_del):
         """Cleanup after renaming/duplicating a level."""
@@ -0,0 +1,186 @@
+"""Brain Requirement Just A Formality.  Copyright 2011 by J.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+
+"""
+
+from threading import Thread
+from time import sleep
+
+from puzzle import Puzzle, Block, StepLimitError
+from solver import soln_inputs
+import level
+import conf
+
+# solution statuses
+WINS = 0
+FAILS = 1
+STARTS_WINNING = 2
+
+def union (changed1, changed2):
+    """Combine two sets of changed tiles as taken by Playtest.
+
+Either may be None (anything changed), in which case the result is None.
+
+"""
+    if changed1 is None or changed2 is None:
+        return None
+    else:
+        return changed1 | changed2
+
+
+class Playtest (Thread):
+    """Run solutions against a puzzle in a background thread.  Inherits from
+threading.Thread.
+
+Playtest(defn, solutions[, previous][, changed])
+
+defn: puzzle definition (without messages or solutions).
+solutions: list of solution strings, in the format found in level definitions.
+previous: a Playtest run for an earlier version of the puzzle.  Where it has
+          finished running a solution, its results are reused for all frames
+          before the first one the changes could affect.
+changed: the set of (x, y) tiles whose surfaces have changed since previous's
+         definition, or None if anything else changed (the puzzle's size or
+         blocks), in which case nothing is reused.
+
+Solutions are simulated with the input level.Level gives the puzzle when
+solving, and the same winning conditions and waiting afterwards as used to
+check the solutions of shared levels (as done by solver.Minimiser); a solution
+also fails if a frame's forces take too long to resolve (see Puzzle.step).  The
+puzzle's state is stored after every frame of input, and since surfaces only
+affect blocks on or moving onto them, a changed surface can't make any
+difference until a frame starts with a block next to it.
+
+The thread is started on creation, and yields often to other threads so that
+the game keeps running smoothly.
+
+    METHODS
+
+cancel
+
+    ATTRIBUTES
+
+defn, solutions, previous, changed: as given; previous is set to None once
+                                    finished.
+results: a list of (status, frame) tuples, one for each solution checked so
+         far, in order.  status is WINS, FAILS or STARTS_WINNING (the puzzle
+         starts out winning, so no solution is considered to work), and frame
+         is the number of frames it took to win, or None if it didn't.
+reused: the number of frames of simulation skipped by reusing previous's.
+finished: whether all solutions have been checked (stays False if cancelled).
+cancelled: whether Playtest.cancel has been called.
+
+"""
+
+    def __init__ (self, defn, solutions, previous = None, changed = None):
+        Thread.__init__(self)
+        self.daemon = True
+        self.defn = defn
+        self.solutions = list(solutions)
+        self.previous = previous
+        self.changed = changed
+        self.results = []
+        self.reused = 0
+        self.finished = False
+        self.cancelled = False
+        # {solution: states}, where states is a list of Puzzle.get_state
+        # results, one for the start and after each frame until solving stops
+        self._snapshots = {}
+        self.start()
+
+    def _step (self):
+        # let the main thread in
+        sleep(0)
+        return self.cancelled
+
+    def _resume_frame (self, snapshots):
+        """Get the last frame it's safe to reuse from a previous run's states.
+"""
+        changed = self.changed
+        near = set((x + i, y + j) for x, y in changed for i in (-1, 0, 1)
+                                                   for j in (-1, 0, 1))
+        for frame, state in enumerate(snapshots):
+            for type_ID, x, y, fx, fy in state:
+                if (x, y) in near:
+                    return frame
+        return len(snapshots) - 1
+
+    def _run (self, p, goals, soln):
+        """Simulate a solution; returns (status, frame), or None if cancelled.
+"""
+        try:
+            inputs, end = soln_inputs(level.parse_soln(soln))
+        except ValueError:
+            return (FAILS, None)
+        wins = lambda: all(isinstance(p.grid[x][y][1], Block) and
+                           p.grid[x][y][1].type == type_ID
+                           for x, y, type_ID in goals)
+        # start from the last frame we know will be the same
+        frame = 0
+        prev = self.previous
+        if prev is not None and self.changed is not None:
+            old = prev._snapshots.get(soln)
+            if old is not None:
+                frame = min(self._resume_frame(old), end - 1)
+        if frame:
+            snapshots = old[:frame + 1]
+            self.reused += frame
+        else:
+            snapshots = [p.get_state()]
+        p.set_state(snapshots[-1])
+        winning = frame > 0 and wins()
+        players = p.blocks.of_type(conf.B_PLAYER)
+        while True:
+            frame += 1
+            for d in inputs.get(frame, ()):
+                for b in players:
+                    b.add_force(d, conf.FORCE_MOVE)
+            try:
+                changed = p.step(True)
+            except StepLimitError:
+                # the frame never finishes
+                self._snapshots[soln] = snapshots
+                return (FAILS, None)
+            if self._step():
+                return None
+            # need to win on two frames in a row, once finished solving
+            if wins():
+                if winning and frame >= end:
+                    self._snapshots[soln] = snapshots
+                    return (WINS, frame)
+                winning = True
+            else:
+                winning = False
+            if frame < end:
+                snapshots.append(p.get_state())
+            elif frame > end and (not changed or
+                                  frame - end >= conf.POST_SOLVE_WAIT):
+                # Level stops when nothing changes
+                self._snapshots[soln] = snapshots
+                return (FAILS, None)
+
+    def run (self):
+        if level.defn_wins(self.defn):
+            self.results = [(STARTS_WINNING, None)] * len(self.solutions)
+        else:
+            p = Puzzle(None, self.defn, True, False)
+            goals = [(x, y, s) for x, col in enumerate(p.grid)
+                     for y, (s, b, sel) in enumerate(col) if s >= 0]
+            start = p.get_state()
+            for soln in self.solutions:
+                p.set_state(start)
+                result = self._run(p, goals, soln)
+                if result is None:
+                    # cancelled
+                    return
+                self.results.append(result)
+        self.previous = None
+        self.finished = True
+
+    def cancel (self):
+        """Stop running solutions as soon as possible."""
+        self.cancelled = True
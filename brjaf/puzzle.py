@@ -23,11 +23,14 @@ Axes are:
 
 from os import sep as path_sep
 from os.path import exists
-from random import randrange
+from random import Random
+from hashlib import sha1
+from math import log
 import zlib
 
 import pygame
 from ext.tiler import Tiler, draw_rect
+from ext.profiler import Profiler
 from ext.stringcompress import compress, decompress, encode, decode, printable
 
 import conf
@@ -42,13 +45,250 @@ import conf
 # - autocrop just does surface.get_bounding_rect()
 
 byte_chars = [chr(i) for i in xrange(256)]
+# share code format version written by compress_lvl
+CODE_VERSION = 2
+# increase whenever a change could alter the outcome of a solution, so that
+# cached results (see verify) are discarded
+ENGINE_VERSION = 1
+# v2 share code value ranges and text models
+_N_SURFACES = conf.MAX_ID - conf.MIN_ID + 1
+_N_BLOCKS = conf.B_PORTAL + 1
+_SOLN_CHARS = ',lurd0123456789[]<>=:'
+_TEXT_MODEL_INC = 24
+# counts are halved when their total goes over this
+_TEXT_MODEL_MAX = 1 << 16
+# probabilities are coded as multiples of 2 ** -_CODE_PRECISION (so model
+# totals must be no bigger than 2 ** _CODE_PRECISION), and the coder's state is
+# kept between _CODE_LOW and _CODE_LOW * base; a lower bound costs fewer
+# characters when flushing the state, but makes coding less precise
+_CODE_PRECISION = 16
+_CODE_LOW = 1 << 20
+# rough English letter frequencies (per 1000) for messages
+_MSG_PRIOR = dict(zip(' etaoinsrhldcumfpgwybvkxjqz.', (
+    180, 102, 75, 65, 62, 57, 55, 51, 49, 48, 33, 26, 22, 20, 16, 15, 14, 13,
+    12, 12, 11, 8, 5, 2, 1, 1, 1, 10
+)))
+
+def _msg_model ():
+    return _TextModel(conf.PRINTABLE_L, _MSG_PRIOR)
+
+def _soln_model ():
+    return _TextModel(_SOLN_CHARS, order = 2)
+
+def _split_defn (defn):
+    """Split a level definition into its parts.
+
+_split_defn(defn) -> (first, blocks, surfaces, msgs, solns)
+
+first: the numbers on the first line.
+blocks, surfaces: lists of lists of numbers.
+msgs, solns: lists of message and solution strings.
 
-def compress_lvl (ID):
-    """Compress a saved custom level."""
-    # load level
-    d = conf.LEVEL_DIR_DRAFT if ID[0] == 2 else conf.LEVEL_DIR_CUSTOM
-    with open(d + ID[1]) as f:
-        defn = f.read()
+"""
+    lines = [l.strip() for l in defn.splitlines()]
+    msgs = [l[1:].strip() for l in lines if l.startswith('@')]
+    solns = [l[1:].strip() for l in lines if l.startswith(':')]
+    sections = [[]]
+    for l in lines:
+        if not l:
+            # blank line ends a section
+            if sections[-1]:
+                sections.append([])
+        elif l[0] not in '@:#':
+            sections[-1].append([int(n) for n in l.split()])
+    first, blocks = sections[0][0], sections[0][1:]
+    surfaces = sections[1] if len(sections) > 1 else []
+    return first, blocks, surfaces, msgs, solns
+
+class _TextModel (object):
+    """Adaptive probability model for strings, used by share codes.
+
+_TextModel(alphabet, prior = {}, order = 0)
+
+alphabet: sequence of characters that may occur.
+prior: {char: weight} giving initial frequencies (default 1).
+order: number of previous characters used as context.
+
+Symbols are indices into alphabet; len(alphabet) is the end of the string.
+
+"""
+
+    def __init__ (self, alphabet, prior = {}, order = 0):
+        self.alphabet = alphabet
+        self._init = [prior.get(c, 1) for c in alphabet] + [1]
+        self._order = order
+        self._counts = {}
+        self._context = ()
+
+    def counts (self):
+        """Get the current frequencies of symbols."""
+        context = self._context
+        try:
+            return self._counts[context]
+        except KeyError:
+            counts = self._counts[context] = list(self._init)
+            return counts
+
+    def update (self, sym):
+        """Adapt the model after a symbol is coded."""
+        counts = self.counts()
+        counts[sym] += _TEXT_MODEL_INC
+        if sum(counts) > _TEXT_MODEL_MAX:
+            counts[:] = [(n + 1) / 2 for n in counts]
+        if self._order:
+            self._context = (self._context + (sym,))[-self._order:]
+
+
+def _scale (cum, freq, total):
+    """Convert a symbol's frequencies to fixed precision for coding.
+
+_scale(cum, freq, total) -> (cum, freq)
+
+cum: total frequency of the symbols before this one.
+freq: frequency of this symbol.
+total: total frequency of all symbols; must be at most 2 ** _CODE_PRECISION.
+
+"""
+    start = (cum << _CODE_PRECISION) / total
+    return (start, ((cum + freq) << _CODE_PRECISION) / total - start)
+
+
+class _CodeWriter (object):
+    """Arithmetic (range variant of asymmetric numeral systems) encoder.
+
+Data is streamed out as digits in any base, with the coder's state kept to a
+fixed size, so coding takes time linear in the amount of data.  Each value
+costs almost exactly the information it carries under its model: no bits are
+wasted rounding fields up to whole bytes.  Values are coded in reverse so that
+a _CodeReader gets them back in the order they were stored.
+
+"""
+
+    def __init__ (self):
+        self._syms = []
+
+    def put (self, x, base):
+        """Store a value in the range [0, base) with uniform probability.
+
+base may be at most 2 ** _CODE_PRECISION.
+
+"""
+        if not 0 <= x < base:
+            raise ValueError('can\'t encode {0} in base {1}'.format(x, base))
+        self._syms.append(_scale(x, 1, base))
+
+    def put_num (self, x):
+        """Store a non-negative integer of any size (octal varint)."""
+        if x < 0:
+            raise ValueError('can\'t encode a negative number')
+        while x > 7:
+            self.put(8 | (x & 7), 16)
+            x >>= 3
+        self.put(x, 16)
+
+    def put_str (self, s, model):
+        """Store a string using a _TextModel."""
+        index = dict((c, i) for i, c in enumerate(model.alphabet))
+        try:
+            syms = [index[c] for c in s]
+        except KeyError, e:
+            raise ValueError('can\'t encode character {0!r}'.format(e.args[0]))
+        for sym in syms + [len(index)]:
+            counts = model.counts()
+            self._syms.append(_scale(sum(counts[:sym]), counts[sym],
+                                     sum(counts)))
+            model.update(sym)
+
+    def get_digits (self, base):
+        """Return the encoded data as a list of digits in the given base."""
+        digits = []
+        x = _CODE_LOW
+        # state must be in [_CODE_LOW, _CODE_LOW * base) between values
+        low = _CODE_LOW >> _CODE_PRECISION
+        for cum, freq in reversed(self._syms):
+            high = low * base * freq
+            while x >= high:
+                digits.append(x % base)
+                x /= base
+            x = ((x / freq) << _CODE_PRECISION) + cum + x % freq
+        while x:
+            digits.append(x % base)
+            x /= base
+        digits.reverse()
+        return digits
+
+
+class _CodeReader (object):
+    """Decoder for data written by a _CodeWriter.
+
+_CodeReader(digits, base)
+
+digits: sequence of digits returned by _CodeWriter.get_digits.
+base: the base the digits are in.
+
+Methods correspond to those of _CodeWriter, and take the same arguments except
+the value.  They raise ValueError if the data runs out.
+
+"""
+
+    def __init__ (self, digits, base):
+        self._digits = iter(digits)
+        self._base = base
+        self._x = 0
+        self._fill()
+
+    def _fill (self):
+        """Read in digits until the state is back in range."""
+        x = self._x
+        while x < _CODE_LOW:
+            try:
+                x = x * self._base + next(self._digits)
+            except StopIteration:
+                raise ValueError('code is too short')
+        self._x = x
+
+    def _slot (self):
+        """Get the position of the next value within the coded range."""
+        return self._x & ((1 << _CODE_PRECISION) - 1)
+
+    def _decode (self, cum, freq):
+        """Remove a value with the given scaled frequencies from the state."""
+        self._x = freq * (self._x >> _CODE_PRECISION) + self._slot() - cum
+        self._fill()
+
+    def get (self, base):
+        d = ((self._slot() + 1) * base - 1) >> _CODE_PRECISION
+        self._decode(*_scale(d, 1, base))
+        return d
+
+    def get_num (self):
+        x = shift = 0
+        while 1:
+            d = self.get(16)
+            x |= (d & 7) << shift
+            if d < 8:
+                return x
+            shift += 3
+
+    def get_str (self, model):
+        alphabet = model.alphabet
+        s = []
+        while 1:
+            counts = model.counts()
+            total = sum(counts)
+            slot = self._slot()
+            sym = cum = 0
+            while ((cum + counts[sym]) << _CODE_PRECISION) / total <= slot:
+                cum += counts[sym]
+                sym += 1
+            self._decode(*_scale(cum, counts[sym], total))
+            model.update(sym)
+            if sym == len(alphabet):
+                return ''.join(s)
+            s.append(alphabet[sym])
+
+def _compress_lvl_v1 (defn):
+    """Compress a level definition into the original (unversioned) format."""
     # extract messages/solutions
     markers = ('@', ':')
     defn = [l.strip() for l in defn.splitlines()]
@@ -73,7 +313,7 @@ def compress_lvl (ID):
             # need to modify the list itself
             b.pop(-1)
             b.pop(-1)
-            portal_data.append(d)
+            portal_data.append(data)
     # compress
     chars = printable
     sep, chars = chars[0], chars[1:]
@@ -114,8 +354,114 @@ def compress_lvl (ID):
     compressed.append(s)
     return sep.join(compressed)
 
-def decompress_lvl (s):
-    """Decompress a compressed level."""
+def _compress_lvl_v2 (defn):
+    """Compress a level definition into the version 2 format.
+
+The whole level is stored using a _CodeWriter, and the resulting digits are
+written out as printable characters.  The data is:
+
+ - numbers: width, height; then the default surface
+ - surfaces: run-length encoded over tiles in column-major order, each run a
+   number (length - 1) followed by the surface ID; since consecutive runs have
+   different surfaces, the ID is stored relative to the previous one
+ - blocks: a bitmap of occupied tiles in the same order followed by the type
+   of each block, then the number of blocks with extra data and for each of
+   those, numbers: block index, number of values, values
+ - messages and solutions: a flag indicating whether they're stored as raw
+   deflate data; then either the bytes, or the messages and solutions
+   ('@'-/':'-separated) as strings coded with adaptive models
+
+"""
+    first, blocks, surfaces, msgs, solns = _split_defn(defn)
+    w, h = first[:2]
+    m = conf.MIN_ID
+    n_s = _N_SURFACES
+    default_s = first[2] if len(first) > 2 else conf.DEFAULT_SURFACE
+    c = _CodeWriter()
+    c.put_num(w)
+    c.put_num(h)
+    c.put(default_s - m, n_s)
+    # surfaces
+    n_tiles = w * h
+    tiles = [default_s] * n_tiles
+    for s, x, y in surfaces:
+        tiles[x * h + y] = s
+    runs = []
+    for s in tiles:
+        if runs and runs[-1][0] == s:
+            runs[-1][1] += 1
+        else:
+            runs.append([s, 1])
+    last = None
+    for s, run in runs:
+        c.put_num(run - 1)
+        s -= m
+        if last is None:
+            c.put(s, n_s)
+        else:
+            # can't be the same as the last run
+            c.put((s - last - 1) % n_s, n_s - 1)
+        last = s
+    # blocks: later blocks replace earlier ones on the same tile, as in a Puzzle
+    by_tile = {}
+    for b in blocks:
+        by_tile[b[1] * h + b[2]] = b
+    for i in xrange(n_tiles):
+        c.put(i in by_tile, 2)
+    order = sorted(by_tile)
+    for i in order:
+        c.put(by_tile[i][0], _N_BLOCKS)
+    extra = [(j, by_tile[i][3:]) for j, i in enumerate(order)
+             if len(by_tile[i]) > 3]
+    c.put_num(len(extra))
+    for j, values in extra:
+        c.put_num(j)
+        c.put_num(len(values))
+        for v in values:
+            c.put_num(v)
+    # text: use raw deflate if it's shorter
+    msgs = '@'.join(msgs)
+    solns = ':'.join(solns)
+    z = zlib.compressobj(9, zlib.DEFLATED, -15)
+    text = z.compress(msgs + '\n' + solns) + z.flush()
+    chars = printable
+    sep, chars = chars[0], chars[1:]
+    plain = _CodeWriter()
+    plain.put_str(msgs, _msg_model())
+    plain.put_str(solns, _soln_model())
+    deflate = (len(plain.get_digits(len(chars))) * log(len(chars)) >=
+               (len(text) + 1) * log(256))
+    c.put(deflate, 2)
+    if deflate:
+        c.put_num(len(text))
+        for char in text:
+            c.put(ord(char), 256)
+    else:
+        c.put_str(msgs, _msg_model())
+        c.put_str(solns, _soln_model())
+    digits = c.get_digits(len(chars))
+    return sep + str(CODE_VERSION) + ''.join(chars[d] for d in digits)
+
+def compress_lvl (ID, version = CODE_VERSION):
+    """Compress a saved custom level.
+
+compress_lvl(ID, version = CODE_VERSION) -> code
+
+ID: custom level ID, as taken by Level.
+version: share code format to use: 1 (original) or 2.
+
+"""
+    # load level
+    d = conf.LEVEL_DIR_DRAFT if ID[0] == 2 else conf.LEVEL_DIR_CUSTOM
+    with open(d + ID[1]) as f:
+        defn = f.read()
+    if version == 1:
+        return _compress_lvl_v1(defn)
+    else:
+        return _compress_lvl_v2(defn)
+
+def _decompress_lvl_v1 (s):
+    """Decompress a level compressed with _compress_lvl_v1."""
     chars = printable
     sep, chars = chars[0], chars[1:]
     try:
@@ -168,7 +514,60 @@ def decompress_lvl (s):
         solns2 = decompress(solns2, chars, soln_chars)
         solns = solns1 + solns2
     solns = solns.split(':')
-    # create definition
+    return _join_defn(first, blocks, surfaces, msgs, solns)
+
+def _decompress_lvl_v2 (s):
+    """Decompress a level compressed with _compress_lvl_v2."""
+    chars = printable[1:]
+    index = dict((d, i) for i, d in enumerate(chars))
+    try:
+        digits = [index[d] for d in s]
+    except KeyError, e:
+        raise ValueError('invalid character: {0!r}'.format(e.args[0]))
+    c = _CodeReader(digits, len(chars))
+    m = conf.MIN_ID
+    n_s = _N_SURFACES
+    w = c.get_num()
+    h = c.get_num()
+    default_s = c.get(n_s) + m
+    first = '{0} {1}'.format(w, h)
+    if default_s != conf.DEFAULT_SURFACE:
+        first += ' ' + str(default_s)
+    # surfaces
+    n_tiles = w * h
+    surfaces = []
+    tile = 0
+    last = None
+    while tile < n_tiles:
+        run = c.get_num() + 1
+        if last is None:
+            last = c.get(n_s)
+        else:
+            last = (last + c.get(n_s - 1) + 1) % n_s
+        if last + m != default_s:
+            for i in xrange(tile, tile + run):
+                surfaces.append((last + m, i / h, i % h))
+        tile += run
+    # blocks
+    occupied = [i for i in xrange(n_tiles) if c.get(2)]
+    blocks = [[c.get(_N_BLOCKS), i / h, i % h] for i in occupied]
+    for k in xrange(c.get_num()):
+        b = blocks[c.get_num()]
+        for k in xrange(c.get_num()):
+            b.append(c.get_num())
+    # text
+    if c.get(2):
+        text = ''.join(chr(c.get(256)) for i in xrange(c.get_num()))
+        msgs, solns = zlib.decompress(text, -15).split('\n', 1)
+    else:
+        msgs = c.get_str(_msg_model())
+        solns = c.get_str(_soln_model())
+    msgs = msgs.split('@') if msgs else []
+    solns = solns.split(':') if solns else []
+    return _join_defn(first, blocks, surfaces, msgs, solns)
+
+def _join_defn (first, blocks, surfaces, msgs, solns):
+    """Create a definition string from its parts (see _split_defn)."""
     defn = [first]
     defn.append('\n\n'.join('\n'.join(' '.join(str(n) for n in l)
                             for l in data) for data in (blocks, surfaces)))
@@ -178,6 +577,23 @@ def decompress_lvl (s):
             defn.append(data)
     return '\n'.join(defn)
 
+def decompress_lvl (s):
+    """Decompress a compressed level.
+
+The format version is detected automatically: versioned codes start with the
+separator character, which the original format never does.
+
+"""
+    sep = printable[0]
+    if s.startswith(sep):
+        version = int(s[1])
+        if version == 2:
+            return _decompress_lvl_v2(s[2:])
+        else:
+            raise ValueError('unknown code version: {0}'.format(version))
+    else:
+        return _decompress_lvl_v1(s)
+
 def autocrop (s):
     """Return the smallest rect containing all non-transparent pixels.
 
@@ -201,6 +617,26 @@ Returns False if the image is completely transparent.
     b = borders
     return (b[0], b[1], b[2] - b[0], b[3] - b[1])
 
+_zobrist_keys = {}
+
+def zobrist_key (*data):
+    """Get the Zobrist hashing key for some data.
+
+Keys are random-looking 64-bit integers derived from the data (which should be
+a tuple of integers and strings), so they are the same in every process.
+
+"""
+    try:
+        return _zobrist_keys[data]
+    except KeyError:
+        key = int(sha1(repr(data)).hexdigest()[:16], 16)
+        _zobrist_keys[data] = key
+        return key
+
+class StepLimitError (RuntimeError):
+    """Raised by Puzzle.step when resolving forces takes too long."""
+    pass
+
 def is_immoveable (tile):
     """Determine whether a tile contains an immoveable object.
 
@@ -250,9 +686,13 @@ class BoringBlock (object):
         self.tiler = puzzle.tiler
         self.pos = list(pos)
         if dirn is None:
-            dirn = randrange(4)
+            dirn = puzzle.rng.randrange(4)
         self.dirn = dirn
         self.portal_type = None
+        # key this block contributes to Puzzle.hash, or 0 if not in a puzzle
+        self.hash_key = 0
+        # ID in Puzzle.blocks, or None if not in a puzzle
+        self.ID = None
 
     def __str__ (self):
         return '<block: {0} at {1}>'.format(self.type, self.pos)
@@ -485,14 +925,129 @@ class Block (BoringBlock):
         self.handled = handled
 
 
+class BlockRegistry (object):
+    """The blocks in a puzzle, indexed by ID and type.
+
+BlockRegistry()
+
+Adding and removing blocks takes constant time.  Iterating over a registry
+gives its blocks in the order they were added, and len gives the number of
+blocks.
+
+    METHODS
+
+add
+remove
+list
+of_type
+clear
+
+    ATTRIBUTES
+
+by_ID: {ID: block} dict of all blocks.  Each block's ID is stored in its ID
+       attribute when added, and stays the same until it is removed; IDs are
+       never reused by the same registry.
+
+"""
+
+    def __init__ (self):
+        self.by_ID = {}
+        self._types = {}
+        # {types: blocks} results of BlockRegistry.of_type, until blocks change
+        self._of_type = {}
+        # IDs in the order added, including removed ones until compacted
+        self._order = []
+        self._next_ID = 0
+
+    def __len__ (self):
+        return len(self.by_ID)
+
+    def __iter__ (self):
+        return iter(self.list())
+
+    def __contains__ (self, block):
+        return self.by_ID.get(getattr(block, 'ID', None)) is block
+
+    def add (self, block):
+        """Add a block and return its ID."""
+        ID = block.ID = self._next_ID
+        self._next_ID += 1
+        self.by_ID[ID] = block
+        self._order.append(ID)
+        try:
+            self._types[block.type][ID] = block
+        except KeyError:
+            self._types[block.type] = {ID: block}
+        self._of_type = {}
+        return ID
+
+    def remove (self, block):
+        """Remove a block; raises ValueError if it's not in the registry."""
+        if block not in self:
+            raise ValueError('block not in registry')
+        ID = block.ID
+        del self.by_ID[ID]
+        del self._types[block.type][ID]
+        self._of_type = {}
+        block.ID = None
+        # drop removed IDs once they take up most of the list
+        order = self._order
+        if len(order) > 2 * len(self.by_ID) + 16:
+            self._order = [i for i in order if i in self.by_ID]
+
+    def list (self):
+        """Get a list of all blocks, in the order they were added."""
+        by_ID = self.by_ID
+        return [by_ID[ID] for ID in self._order if ID in by_ID]
+
+    def of_type (self, *types):
+        """Get a list of blocks with any of the given types, in added order.
+
+The list is shared between calls until blocks are added or removed, so it
+shouldn't be modified.
+
+"""
+        try:
+            return self._of_type[types]
+        except KeyError:
+            pass
+        bs = []
+        for t in types:
+            bs += self._types.get(t, {}).items()
+        bs.sort()
+        bs = self._of_type[types] = [b for ID, b in bs]
+        return bs
+
+    def clear (self):
+        """Remove all blocks."""
+        for b in self.by_ID.itervalues():
+            b.ID = None
+        self.by_ID = {}
+        self._types = {}
+        self._of_type = {}
+        self._order = []
+
+
+# used by puzzles with no game to get a profiler from
+_no_profiler = Profiler(False)
+
 class Puzzle (object):
     def __init__ (self, game, defn, physics = False, sound = False,
-                  **tiler_kw_args):
+                  seed = None, **tiler_kw_args):
         self.game = game
+        self.profiler = getattr(game, 'profiler', _no_profiler)
+        # random source: seed from the game's if we have one
+        if seed is None and hasattr(game, 'rng'):
+            seed = game.rng.getrandbits(32)
+        self.rng = Random(seed)
         self.physics = physics
         self.sound = sound
         self.selected = {}
         self.rect = None
+        # tiles drawn without their images because they weren't scaled yet,
+        # and the Game.imgs_version they were drawn at
+        self._img_waiting = set()
+        self._imgs_version = None
         self.load(defn, **tiler_kw_args)
 
     def _next_ints (self, lines):
@@ -510,25 +1065,52 @@ class Puzzle (object):
                 return False
 
     def reset (self, *tiles):
+        """Restore tiles to their state when the puzzle was loaded.
+
+reset(*tiles)
+
+tiles: (x, y) positions of tiles to reset; if none are given, the whole puzzle
+       is reset.
+
+"""
+        cls = Block if self.physics else BoringBlock
+        init_blocks = self._init_blocks
+        init_surfaces = self._init_surfaces
         if tiles:
-            # reset given tiles
-            tiles = [(x, y) for x, y in tiles]
+            for x, y in tiles:
+                self.rm_block(None, x, y)
+                self.set_surface(x, y, init_surfaces.get((x, y)))
+                try:
+                    type_ID, dirn = init_blocks[(x, y)]
+                except KeyError:
+                    pass
+                else:
+                    self.add_block((cls, type_ID, dirn), x, y)
         else:
-            # reset all tiles
-            tiles = [[(i, j) for i in xrange(self.w)] for j in xrange(self.h)]
-            tiles = sum(tiles, [])
-        # clear tiles we want to change
-        for x, y in tiles:
-            self.rm_block(None, x, y)
-            self.set_surface(x, y)
-        # add initial blocks and surfaces back
-        cls = Block if self.physics else BoringBlock
-        for type_ID, (x, y), dirn in self._init_blocks:
-            if (x, y) in tiles:
-                self.add_block((cls, type_ID, dirn), x, y)
-        for type_ID, x, y in self._init_surfaces:
-            if (x, y) in tiles:
-                self.set_surface(x, y, type_ID)
+            self._clear_blocks()
+            for x, col in enumerate(self.grid):
+                for y in xrange(len(col)):
+                    self.set_surface(x, y, init_surfaces.get((x, y)))
+            # add blocks in the order they were defined
+            for pos in self._init_block_order:
+                type_ID, dirn = init_blocks[pos]
+                self.add_block((cls, type_ID, dirn), *pos)
+
+    def reset_region (self, x, y, w, h):
+        """Reset a rectangle of tiles (see Puzzle.reset).
+
+reset_region(x, y, w, h)
+
+x, y: the top-left tile.
+w, h: the size of the region in tiles; it is clipped to the puzzle.
+
+"""
+        x1 = min(x + w, self.w)
+        y1 = min(y + h, self.h)
+        x, y = max(x, 0), max(y, 0)
+        tiles = [(i, j) for i in xrange(x, x1) for j in xrange(y, y1)]
+        if tiles:
+            self.reset(*tiles)
 
     def load (self, defn, **tiler_kw_args):
         """Initialise puzzle from a definition.
@@ -558,20 +1140,30 @@ dirty).  Preserves any selection, if possible.
             self.h = h
             self.size = (self.w, self.h)
         self.default_s = default_s
-        # extract blocks from definition
-        bs = []
+        # extract blocks from definition into {pos: (type_ID, dirn)}, ignoring
+        # any outside the puzzle
+        bs = {}
+        order = []
         line = self._next_ints(lines)
         while line:
             type_ID, i, j = line
-            bs.append((type_ID, (i, j), randrange(4)))
+            dirn = self.rng.randrange(4)
+            if 0 <= i < self.w and 0 <= j < self.h:
+                if (i, j) in bs:
+                    order.remove((i, j))
+                bs[(i, j)] = (type_ID, dirn)
+                order.append((i, j))
             line = self._next_ints(lines)
         self._init_blocks = bs
-        self.blocks = []
-        # extract non-default surface types from definition
-        ss = []
+        self._init_block_order = order
+        self.blocks = BlockRegistry()
+        # extract non-default surface types from definition into {pos: type_ID}
+        ss = {}
         line = self._next_ints(lines)
         while line:
-            ss.append(line)
+            type_ID, i, j = line
+            if 0 <= i < self.w and 0 <= j < self.h:
+                ss[(i, j)] = type_ID
             line = self._next_ints(lines)
         self._init_surfaces = ss
         # create grid handler if need to
@@ -583,16 +1175,24 @@ dirty).  Preserves any selection, if possible.
                               ('border', 'PUZZLE_BORDER_WIDTH')):
                 if key not in tiler_kw_args:
                     tiler_kw_args[key] = getattr(conf, attr)[conf.THEME]
+            if 'mode' not in tiler_kw_args:
+                tiler_kw_args['mode'] = ('view', conf.MIN_TILE_SIZE)
             self.tiler = Tiler(w, h, self.draw_tile, track_tiles = False,
                                **tiler_kw_args)
             resized = False
         # create grid with default surface
         self.grid = []
+        # {surface: tiles} for surfaces other than the default, kept up to date
+        # by set_surface and resize
+        self._s_tiles = {}
         for i in xrange(self.w):
             col = []
             for j in xrange(self.h):
                 col.append([self.default_s, None, False])
             self.grid.append(col)
+        # Zobrist hash of the surfaces, blocks and retained forces, kept up to
+        # date by add_block, rm_block, set_surface and step
+        self._reset_hash()
         # preserve selection
         sel = self.selected
         self.reset()
@@ -630,7 +1230,8 @@ new_block: the added block.
         self.rm_block(None, x, y)
         # add new block
         self.grid[x][y][1] = block
-        self.blocks.append(block)
+        self.blocks.add(block)
+        self._rehash_block(block)
         self.tiler.change((x, y))
         return block
 
@@ -645,12 +1246,26 @@ new_block: the added block.
         if block is not None:
             self.grid[x][y][1] = None
             self.blocks.remove(block)
+            self.hash ^= block.hash_key
+            block.hash_key = 0
             self.tiler.change((x, y))
             return block
         else:
             # passed nothing or tile has no block
             return None
 
+    def _clear_blocks (self):
+        # remove all blocks, faster than rm_block for each
+        grid = self.grid
+        change = self.tiler.change
+        for b in self.blocks:
+            x, y = b.pos
+            grid[x][y][1] = None
+            self.hash ^= b.hash_key
+            b.hash_key = 0
+            change((x, y))
+        self.blocks.clear()
+
     def mv_block (self, block, x, y):
         # move a block
         self.rm_block(block)
@@ -663,6 +1278,17 @@ new_block: the added block.
         old_s = self.grid[x][y][0]
         if old_s != surface:
             self.grid[x][y][0] = surface
+            default = self.default_s
+            if old_s != default:
+                self._s_tiles[old_s].discard((x, y))
+            if surface != default:
+                try:
+                    self._s_tiles[surface].add((x, y))
+                except KeyError:
+                    self._s_tiles[surface] = set([(x, y)])
+            for s in (old_s, surface):
+                if s != self.default_s:
+                    self.hash ^= zobrist_key('s', s, x, y)
             self.tiler.change((x, y))
             return old_s
         else:
@@ -739,7 +1365,7 @@ If the destination tile is out-of-bounds, select the nearest in-bounds tile.
         self.text_adjust = []
 
     def tile_size (self, axis):
-        n_tiles = self.size[axis]
+        n_tiles = self.tiler.shown[axis]
         border = self.tiler.border[axis]
         gap = self.tiler.gap[axis]
         tile_size = (self.rect.size[axis] - 2 * border - gap * (n_tiles - 1))
@@ -750,49 +1376,60 @@ If the destination tile is out-of-bounds, select the nearest in-bounds tile.
 
 resize(amount, direction) -> lost
 
-amount: the number of tiles to resize by, negative to shrink, 1 to grow the
-        puzzle.
+amount: the number of tiles to resize by, negative to shrink, positive to grow
+        the puzzle.
 direction: the direction the 'moved' edge should move in.
 
 lost: list of blocks and surfaces lost because of removed tiles, each in the
-      form (block_or_surface_ID, x, y).  If the resize could not be done
-      amount is 0 or we would end up with 0 rows or columns), this is False
-      instead.
+      form (block_or_surface_ID, x, y), where (x, y) is the tile's position
+      before resizing.  If the resize could not be done (amount is 0 or we
+      would end up with 0 rows or columns), this is False instead.
+
+If shrinking by amount would leave no rows or columns, the puzzle is shrunk as
+far as possible.
 
 """
-        if amount == 0:
-            return False
-        # resize one tile at a time
-        # get new grid size
         axis = direction % 2
         sign = 1 if amount > 0 else -1
-        size = list(self.size)
-        size[axis] += sign
-        if size[axis] == 0:
-            # can't shrink
+        old_size = self.size
+        n = abs(amount)
+        if sign == -1:
+            # can't shrink to nothing
+            n = min(n, old_size[axis] - 1)
+        if n == 0:
             return False
+        # get new grid size
+        size = list(old_size)
+        size[axis] += sign * n
         # get amount to offset everything by
         offset = [0, 0]
-        offset[axis] += (sign - (1 if direction > 1 else -1)) / 2
-        self.size = (w, h) = size
-        # resize tiler
-        self.tiler.w = w
-        self.tiler.h = h
-        self._reset_tiler()
-        # remove any blocks/surfaces in the lost region
+        offset[axis] = n * ((sign - (1 if direction > 1 else -1)) / 2)
+        # remove any blocks/surfaces in the lost region, one row or column at a
+        # time, starting at the moved edge
         lost = []
         if sign == -1:
-            x0, x1, y0, y1 = ((w, w + 1, 0, h), (0, w, h, h + 1), (0, 1, 0, h),
-                              (0, w, 0, 1))[direction]
-            for x in xrange(x0, x1):
-                for y in xrange(y0, y1):
+            if direction > 1:
+                lines = xrange(n)
+            else:
+                lines = xrange(old_size[axis] - 1, old_size[axis] - 1 - n, -1)
+            for line in lines:
+                for other in xrange(old_size[not axis]):
+                    x, y = (line, other) if axis == 0 else (other, line)
                     b = self.rm_block(None, x, y)
                     if b is not None:
                         lost.append((b, x, y))
                     s = self.set_surface(x, y)
                     if s is not None:
                         lost.append((s, x, y))
+        # unmark selected tiles, since they're about to move
+        sel = self.selected
+        for x, y in sel:
+            self.grid[x][y][2] = False
+        self.selected = {}
         # create new grid
+        self.size = (w, h) = size
+        old_w, old_h = old_size
+        old_grid = self.grid
         grid = []
         di, dj = offset
         for i in xrange(w):
@@ -800,84 +1437,179 @@ lost: list of blocks and surfaces lost because of removed tiles, each in the
             i -= di
             for j in xrange(h):
                 j -= dj
-                if 0 <= i < self.w and 0 <= j < self.h:
-                    col.append(self.grid[i][j])
+                if 0 <= i < old_w and 0 <= j < old_h:
+                    col.append(old_grid[i][j])
                 else:
                     # doesn't come from current grid
                     col.append([self.default_s, None, False])
             grid.append(col)
         self.grid = grid
         self.w, self.h = self.size
-        for pos, colour in self.selected.items():
-            orig_pos = pos
-            # offset selected tiles
-            pos = list(pos)
-            pos[0] += di
-            pos[1] += dj
-            x, y = pos
-            # push selection back onto the grid
-            if not (0 <= x < self.w and 0 <= y < self.h):
-                for axis in (0, 1):
-                    limit = self.size[axis] - 1
-                    pos[axis] = min(max(pos[axis], 0), limit)
-            self.deselect(orig_pos)
-            self.select(pos, colour)
-        inner_lost = self.resize(amount - sign, direction)
-        if inner_lost is not False:
-            lost += inner_lost
+        for b in self.blocks:
+            b.pos = [b.pos[0] + di, b.pos[1] + dj]
+        self._s_tiles = dict((s, set((x + di, y + dj) for x, y in ps))
+                             for s, ps in self._s_tiles.iteritems())
+        self._reset_hash()
+        # resize tiler
+        self.tiler.w = w
+        self.tiler.h = h
+        self._reset_tiler()
+        # offset selected tiles, pushing them back onto the grid
+        for (x, y), colour in sel.iteritems():
+            x = min(max(x + di, 0), w - 1)
+            y = min(max(y + dj, 0), h - 1)
+            self.select((x, y), colour)
         return lost
 
-    def definition (self):
-        """Return a definition string for the puzzle's current state."""
-        # get blocks and surfaces from self.grid
-        bs = []
-        ss = []
-        s_count = {}
-        for i in xrange(len(self.grid)):
-            col = self.grid[i]
-            for j in xrange(len(col)):
-                s, b, sel = col[j]
-                if b is not None:
-                    bs.append('{0} {1} {2}'.format(b.type, i, j))
-                ss.append((s, '{0} {1} {2}'.format(s, i, j)))
-                try:
-                    s_count[s] += 1
-                except KeyError:
-                    s_count[s] = 1
-        # get most common surface type to use as default
-        # we only want one, so don't worry about types with the same freqency
-        s_count = dict((v, k) for k, v in s_count.iteritems())
-        common_s = s_count[max(s_count)]
+    def definition (self, f = None):
+        """Get a definition string for the puzzle's current state.
+
+definition([f]) -> defn
+
+f: a file object to write the definition to.  If given, nothing is returned.
+
+The most common surface is used as the default surface in the definition, so
+only tiles with other surfaces are listed.  This takes time proportional to the
+number of blocks and of tiles without the puzzle's default surface.
+
+"""
+        if f is None:
+            parts = []
+            write = parts.append
+        else:
+            write = f.write
+        # get most common surface type to use as default; prefer the standard
+        # default, then lower IDs, if there's a tie
         default = conf.DEFAULT_SURFACE
-        # compile definition
-        return '{0} {1}{2}{3}{4}\n\n{5}'.format(
-            self.w, self.h, '' if common_s == default else ' ' + str(common_s),
-            '\n' if bs else '',
-            '\n'.join(bs),
-            # don't need individual tiles for most common surface
-            '\n'.join(data for s, data in ss if s != common_s)
-        )
+        counts = dict((s, len(ps)) for s, ps in self._s_tiles.iteritems())
+        counts[self.default_s] = self.w * self.h - sum(counts.itervalues())
+        common_s = max(counts, key = lambda s: (counts[s], s == default, -s))
+        write('{0} {1}{2}'.format(
+            self.w, self.h, '' if common_s == default else ' ' + str(common_s)
+        ))
+        # blocks, in order of position
+        bs = sorted((b.pos[0], b.pos[1], b.type) for b in self.blocks)
+        for x, y, type_ID in bs:
+            write('\n{0} {1} {2}'.format(type_ID, x, y))
+        write('\n\n')
+        # tiles whose surface isn't common_s, in order of position
+        if common_s == self.default_s:
+            ss = [(x, y, s) for s, ps in self._s_tiles.iteritems()
+                  for x, y in ps]
+            ss.sort()
+        else:
+            # need all tiles with the puzzle's default surface: check them all
+            ss = [(x, y, s) for x, col in enumerate(self.grid)
+                  for y, (s, b, sel) in enumerate(col) if s != common_s]
+        write('\n'.join('{0} {1} {2}'.format(s, x, y) for x, y, s in ss))
+        if f is None:
+            return ''.join(parts)
+
+    def get_state (self):
+        """Get a canonical, hashable representation of the blocks.
+
+The result is a sorted tuple of (type, x, y, force_x, force_y) for each block,
+where the forces are the resultant forces retained for the next step (see
+Block.reset).  Block directions are not included, since they don't affect
+physics.  Puzzle.hash identifies the same information (and the surfaces) without
+having to build this.
+
+"""
+        state = []
+        for b in self.blocks:
+            if isinstance(b, Block):
+                fx, fy = b.resultant()
+            else:
+                fx = fy = 0
+            state.append((b.type, b.pos[0], b.pos[1], fx, fy))
+        state.sort()
+        return tuple(state)
+
+    def _reset_hash (self):
+        """Compute Puzzle.hash from scratch."""
+        h = zobrist_key('p', self.w, self.h, self.default_s)
+        for x, col in enumerate(self.grid):
+            for y, (s, b, sel) in enumerate(col):
+                if s != self.default_s:
+                    h ^= zobrist_key('s', s, x, y)
+                if b is not None:
+                    b.hash_key = self._block_hash_key(b, x, y)
+                    h ^= b.hash_key
+        self.hash = h
+
+    def _block_hash_key (self, b, x, y):
+        """Get the key a block at the given tile contributes to Puzzle.hash."""
+        if isinstance(b, Block):
+            fx, fy = b.resultant()
+        else:
+            fx = fy = 0
+        return zobrist_key('b', b.type, x, y, fx, fy)
+
+    def _rehash_block (self, b):
+        """Update Puzzle.hash for changes to a block's position or forces."""
+        key = self._block_hash_key(b, *b.pos)
+        if key != b.hash_key:
+            self.hash ^= b.hash_key ^ key
+            b.hash_key = key
+
+    def set_state (self, state):
+        """Restore blocks from a state returned by Puzzle.get_state."""
+        self._clear_blocks()
+        cls = Block if self.physics else BoringBlock
+        for type_ID, x, y, fx, fy in state:
+            b = self.add_block((cls, type_ID, 0), x, y)
+            if fx or fy:
+                for axis, force in ((0, fx), (1, fy)):
+                    if force:
+                        b.sources[axis][None] = [force, False]
+                b.handled = False
+                self._rehash_block(b)
 
     def play_snd (self, ID):
         """Wrapper around Game.play_snd."""
         if self.sound:
             self.game.play_snd(ID)
 
-    def step (self):
+    def step (self, limit = False):
+        """Move the puzzle forwards a frame.
+
+step(limit = False) -> changed
+
+limit: whether to give up with a StepLimitError after conf.STEP_UPDATE_LIMIT
+       block updates per block while resolving forces, which some puzzles never
+       finish doing.  The puzzle is left in an unusable state, so restore one
+       with Puzzle.set_state before using it again.
+
+changed: whether any blocks moved.
+
+"""
         if conf.DEBUG:
             print 'start step'
+        prof = self.profiler
+        # blocks aren't added or removed while stepping
+        blocks = self.blocks.list()
         # apply arrow forces
-        for col in self.grid:
-            for s, b, sel in col:
-                if s in conf.S_ARROWS and b is not None and not is_immoveable(b):
-                    b.add_force(conf.S_ARROWS.index(s), conf.FORCE_ARROW)
+        prof.start('step: arrows')
+        grid = self.grid
+        arrows = conf.S_ARROWS
+        for b in blocks:
+            s = grid[b.pos[0]][b.pos[1]][0]
+            if s in arrows and not is_immoveable(b):
+                b.add_force(arrows.index(s), conf.FORCE_ARROW)
+        prof.stop('step: arrows')
 
         # resolve forces into block destinations
+        updates_left = conf.STEP_UPDATE_LIMIT * len(blocks)
         while 1:
+            prof.start('step: forces')
             # handle contact forces
             while 1:
-                unhandled = [b for b in self.blocks if not b.handled]
+                unhandled = [b for b in blocks if not b.handled]
                 if unhandled:
+                    updates_left -= len(unhandled)
+                    if limit and updates_left < 0:
+                        prof.stop('step: forces')
+                        raise StepLimitError('forces not resolved')
                     for b in unhandled:
                         b.update()
                 else:
@@ -885,7 +1617,7 @@ lost: list of blocks and surfaces lost because of removed tiles, each in the
 
             # compile block destinations
             dest = {}
-            for b in self.blocks:
+            for b in blocks:
                 resultant = b.resultant()
                 # get destination
                 pos = b.pos[:]
@@ -901,8 +1633,10 @@ lost: list of blocks and surfaces lost because of removed tiles, each in the
                         dest[pos] = [b]
             if conf.DEBUG and dest:
                 print dest
+            prof.stop('step: forces')
 
             # resolve conflicts
+            prof.start('step: conflicts')
             rm = []
             for pos, bs in dest.iteritems():
                 if len(bs) == 1:
@@ -933,8 +1667,9 @@ lost: list of blocks and surfaces lost because of removed tiles, each in the
                                 b.reaction(1 + axis + diff[axis])
             for pos in rm:
                 del dest[pos]
+            prof.stop('step: conflicts')
 
-            if not [b for b in self.blocks if not b.handled]:
+            if not [b for b in blocks if not b.handled]:
                 # done
                 break
 
@@ -942,8 +1677,9 @@ lost: list of blocks and surfaces lost because of removed tiles, each in the
             print dest
 
         # move blocks
+        prof.start('step: move')
         change = set()
-        retain_forces = []
+        retain_forces = set()
         if dest:
             self.play_snd('move')
         for pos, b in dest.iteritems():
@@ -952,7 +1688,7 @@ lost: list of blocks and surfaces lost because of removed tiles, each in the
             self.grid[b.pos[0]][b.pos[1]][1] = None
             slide = self.grid[pos[0]][pos[1]][0] == conf.S_SLIDE
             if b.type in (conf.B_SLIDE, conf.B_BOUNCE) or slide:
-                retain_forces.append(b)
+                retain_forces.add(b)
         for pos, b in dest.iteritems():
             # add
             change.add(pos)
@@ -960,8 +1696,10 @@ lost: list of blocks and surfaces lost because of removed tiles, each in the
             self.grid[pos[0]][pos[1]][1] = b
         self.tiler.change(*change)
         # reset forces
-        for b in self.blocks:
+        for b in blocks:
             b.reset(b in retain_forces)
+            self._rehash_block(b)
+        prof.stop('step: move')
         if conf.DEBUG:
             print 'end step'
         return bool(change)
@@ -971,34 +1709,59 @@ lost: list of blocks and surfaces lost because of removed tiles, each in the
             assert t not in self._draw_cbs
             self._draw_cbs[t] = (f, call_once)
 
-    def _draw_from_img (self, surface, rect, prefix, ID, dirn = None):
-        ID = prefix + str(ID)
-        fn_base = conf.IMG_DIR + conf.THEME + path_sep + ID
+    def _img_file (self, prefix, ID, dirn = None):
+        # get (filename, dirn) for a tile's image, or None if there isn't one,
+        # where dirn is the direction to rotate the image to
+        fn_base = conf.IMG_DIR + conf.THEME + path_sep + prefix + str(ID)
         # if have a direction, look for specially rotated image before fallback
-        suffixes = (None if dirn is None else ('-' + str(dirn)), '')
-        got = False
-        for fallback, suffix in enumerate(suffixes):
-            if suffix is not None:
-                fn = fn_base + suffix + '.png'
-                if exists(fn):
-                    got = True
-                    if not fallback:
-                        ID += suffix
-                        # this is already rotated: no need to rotate in code
-                        dirn = None
-                    break
-        if got:
-            # image might be transparent
-            if prefix == 's':
-                surface.fill(conf.BG[conf.THEME], rect)
-            img = self.game.img(fn, rect)
-            # rotate if necessary
-            if dirn:
-                img = pygame.transform.rotate(img, -90 * dirn)
-            surface.blit(img, rect)
-            return True
-        else:
+        if dirn is not None:
+            fn = fn_base + '-' + str(dirn) + '.png'
+            if exists(fn):
+                # this is already rotated: no need to rotate in code
+                return (fn, None)
+        fn = fn_base + '.png'
+        return (fn, dirn) if exists(fn) else None
+
+    def _draw_from_img (self, surface, rect, prefix, ID, dirn = None):
+        # returns True if drawn, False if there's no image (or it can't be
+        # loaded), or None if the image is still being scaled
+        got = self._img_file(prefix, ID, dirn)
+        if got is None:
             return False
+        fn, dirn = got
+        img = self.game.img(fn, rect, False)
+        if img is None or img is False:
+            return img
+        # image might be transparent
+        if prefix == 's':
+            surface.fill(conf.BG[conf.THEME], rect)
+        # rotate if necessary
+        if dirn:
+            img = pygame.transform.rotate(img, -90 * dirn)
+        surface.blit(img, rect)
+        return True
+
+    def _prefetch_imgs (self, screen, size):
+        # start scaling the images for every tile (including any scrolled out
+        # of view) at the sizes the tiler will draw them at
+        if not hasattr(self.game, 'imgs_version'):
+            # not drawing for a Game: images are loaded as needed
+            return
+        tile_sizes = self.tiler._layout(screen, size)[1]
+        ws, hs = [set([x]) if type(x) is int else set(x) for x in tile_sizes]
+        things = [('s', s, None) for s in self._s_tiles]
+        things.append(('s', self.default_s, None))
+        things += [('b', b.type, b.dirn) for b in self.blocks
+                   if b.type < conf.MIN_CHAR_ID]
+        fns = set()
+        for prefix, ID, dirn in set(things):
+            got = self._img_file(prefix, ID, dirn)
+            if got is not None:
+                fns.add(got[0])
+        for fn in fns:
+            for w in ws:
+                for h in hs:
+                    self.game.img(fn, (w, h), False)
 
     def draw_tile (self, surface, rect, i, j):
         # draw a single tile; called by Tiler
@@ -1006,10 +1769,13 @@ lost: list of blocks and surfaces lost because of removed tiles, each in the
         theme = conf.THEME
         # surface
         if s < 0:
-            # blit image if exists, else use colour
-            if self._draw_from_img(surface, rect, 's', s):
+            # blit image if exists and is ready, else use colour
+            drawn = self._draw_from_img(surface, rect, 's', s)
+            if drawn:
                 colour = ()
             else:
+                if drawn is None:
+                    self._img_waiting.add((i, j))
                 colour = conf.SURFACE_COLOURS[theme][s]
         else:
             # goal: use block colour
@@ -1029,8 +1795,11 @@ lost: list of blocks and surfaces lost because of removed tiles, each in the
         # block
         if b is not None:
             if b.type < conf.MIN_CHAR_ID:
-                # blit image if exists, else use colour
-                if not self._draw_from_img(surface, rect, 'b', b.type, b.dirn):
+                # blit image if exists and is ready, else use colour
+                drawn = self._draw_from_img(surface, rect, 'b', b.type, b.dirn)
+                if drawn is None:
+                    self._img_waiting.add((i, j))
+                if not drawn:
                     rect = pygame.Rect(rect)
                     p = rect.center
                     r = rect.w / 2
@@ -1078,10 +1847,22 @@ lost: list of blocks and surfaces lost because of removed tiles, each in the
         # draw grid and tiles
         if everything:
             self._reset_tiler()
-        try:
-            changed = list(self.tiler._changed)
-        except TypeError:
-            pass
+        version = getattr(self.game, 'imgs_version', None)
+        if version != self._imgs_version:
+            # images might have been scaled for tiles drawn without them
+            self._imgs_version = version
+            self.tiler.change(*self._img_waiting)
+            self._img_waiting = set()
+        if self.tiler._changed is None:
+            # drawing everything
+            self._prefetch_imgs(screen, size)
+        # keep the selection or a player in view if too big to show it all
+        if self.selected:
+            focus = min(self.selected)
+        else:
+            players = self.blocks.of_type(conf.B_PLAYER)
+            focus = players[0].pos if players else None
+        self.tiler.scroll_to(focus, conf.VIEW_MARGIN)
         rects = self.tiler.draw_changed(screen, size)
         if rects is None:
             cbs = []
@@ -1092,7 +1873,9 @@ lost: list of blocks and surfaces lost because of removed tiles, each in the
             cbs = self._draw_cbs.values()
             rtn = [rects]
         else:
-            cbs = [v for k, v in self._draw_cbs.iteritems() if k in changed]
+            # tiles scrolled into view are drawn too
+            drawn = set(self.tiler.drawn)
+            cbs = [v for k, v in self._draw_cbs.iteritems() if k in drawn]
             rtn = rects[1:]
         # call draw callbacks
         cbs = list(set([f for f, once in cbs if once])) + \
@@ -1118,27 +1901,7 @@ Returns None if the point is outside the grid.
         """Get tile containing given (x, y) point.
 
 Returns (x, y) tile position, or False if the point is in the grid but not in a
-tile, or None if the point is outside the grid.
+tile, or None if the point is outside the grid (see Tiler.tile_at).
 
 """
-        if not self.point_in_grid(p):
-            return None
-        result = []
-        for i in (0, 1):
-            border = self.tiler.border[i]
-            tile_size = self.tile_size(i)
-            gap = self.tiler.gap[i]
-            n_tiles = self.size[i]
-            pos = int(p[i])
-            pos -= self.rect[i] + border
-            # take gaps between tiles into account
-            if pos % (tile_size + gap) >= tile_size:
-                # between tiles/on border
-                return False
-            tile = pos / (tile_size + gap)
-            if 0 <= tile < n_tiles:
-                result.append(tile)
-            else:
-                # on border
-                return False
-        return result
\ No newline at end of file
+        return self.tiler.tile_at(p)
\ No newline at end of file
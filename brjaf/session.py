@@ -0,0 +1,156 @@
+"""Brain Requirement Just A Formality.  Copyright 2011 by J.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+
+"""
+
+import json
+import random
+
+import pygame
+from ext import evthandler as eh
+
+import conf
+
+# session file format version
+SESSION_VERSION = 1
+
+def _encode_event (event):
+    """Get a representation of an event that can be saved as JSON."""
+    attrs = {}
+    for k, v in event.dict.iteritems():
+        if isinstance(v, (int, long, float, basestring, tuple, list)):
+            attrs[k] = v
+    return [event.type, attrs]
+
+def _decode_event (data):
+    """Create an event from the return value of _encode_event."""
+    type_, attrs = data
+    attrs = dict((str(k), tuple(v) if isinstance(v, list) else v)
+                 for k, v in attrs.iteritems())
+    return pygame.event.Event(type_, attrs)
+
+def _internal (event):
+    """Whether an event was posted by the game itself (a user event), such as
+conf.EVENT_VERIFY.  These aren't input, so they aren't recorded, and during
+playback they still come from the real event queue."""
+    return event.type >= pygame.USEREVENT
+
+
+class Recorder (object):
+    """An input source (see evthandler) that records input from another.
+
+Recorder(source = evthandler.source[, seed])
+
+source: the input source to record.
+seed: the seed for all randomness in the game: conf.SEED is set to this, so
+      create the Game afterwards to seed Game.rng, and so every Puzzle.rng,
+      with it.  If not given, the seed is random.
+
+Frames here are calls to EventHandler.update.
+
+    METHODS
+
+get
+save
+
+    ATTRIBUTES
+
+source, seed: as given.
+frames: a list of (mods, pressed, events) lists, one for each frame recorded,
+        where pressed is a list of held keys and events is a list of events as
+        returned by _encode_event.  Internal events (those posted by the game,
+        like conf.EVENT_VERIFY) are passed on but not recorded.
+
+"""
+
+    def __init__ (self, source = None, seed = None):
+        self.source = eh.source if source is None else source
+        if seed is None:
+            seed = random.randrange(2 ** 31)
+        self.seed = seed
+        self.frames = []
+        conf.SEED = seed
+
+    def get (self):
+        """Get and record input for a frame."""
+        events, mods, pressed = self.source.get()
+        pressed_keys = [k for k, p in enumerate(pressed) if p]
+        self.frames.append([mods, pressed_keys, [_encode_event(e)
+                            for e in events if not _internal(e)]])
+        return (events, mods, pressed)
+
+    def save (self, fn):
+        """Save the recorded session to a file."""
+        data = {'version': SESSION_VERSION, 'seed': self.seed,
+                'frames': self.frames}
+        with open(fn, 'w') as f:
+            json.dump(data, f)
+
+
+class Player (object):
+    """An input source (see evthandler) that plays back a recorded session.
+
+Player(fn)
+
+fn: the file the session was saved to by Recorder.save.
+
+After the last recorded frame, a pygame.QUIT event is returned every frame.
+Any real input is ignored, but internal events (like conf.EVENT_VERIFY, from
+a verify.Verifier running now) are passed through.  conf.SEED is set to the
+recorded seed, as for Recorder.
+
+    METHODS
+
+get
+
+    ATTRIBUTES
+
+seed: the seed the session was recorded with.
+frames: as for Recorder.
+frame: the index of the next frame to play back.
+finished: whether all frames have been played back.
+
+"""
+
+    def __init__ (self, fn):
+        with open(fn) as f:
+            data = json.load(f)
+        if data.get('version') != SESSION_VERSION:
+            raise ValueError('unknown session format version')
+        self.seed = data['seed']
+        self.frames = data['frames']
+        self.frame = 0
+        self.finished = False
+        self._n_keys = len(pygame.key.get_pressed())
+        conf.SEED = self.seed
+
+    def get (self):
+        """Get input for the next frame."""
+        # discard real input, but keep events the game posted itself
+        internal = [e for e in pygame.event.get() if _internal(e)]
+        if self.frame == len(self.frames):
+            self.finished = True
+            quit = pygame.event.Event(pygame.QUIT, {})
+            return ([quit] + internal, 0, (False,) * self._n_keys)
+        mods, pressed, events = self.frames[self.frame]
+        self.frame += 1
+        keys = [False] * self._n_keys
+        for k in pressed:
+            keys[k] = True
+        events = [_decode_event(e) for e in events]
+        return (events + internal, mods, tuple(keys))
+
+
+def record (seed = None):
+    """Start recording input; returns the Recorder instance."""
+    eh.source = Recorder(eh.source, seed)
+    return eh.source
+
+def play (fn):
+    """Start playing back a recorded session; returns the Player instance."""
+    eh.source = Player(fn)
+    return eh.source
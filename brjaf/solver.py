@@ -0,0 +1,1004 @@
+"""Brain Requirement Just A Formality.  Copyright 2011 by J.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+
+"""
+
+from time import time
+from heapq import heappush, heappop
+from array import array
+from multiprocessing import Process, Queue, Value, cpu_count
+from Queue import Empty
+
+from puzzle import Puzzle, Block, StepLimitError
+import conf
+
+# possible input each frame: nothing, a direction or a diagonal
+INPUTS = ((), (0,), (1,), (2,), (3,), (0, 1), (1, 2), (2, 3), (3, 0))
+
+def pack_state (state):
+    """Encode a state from Puzzle.get_state as a compact string."""
+    return array('h', sum(state, ())).tostring()
+
+def unpack_state (s):
+    """Decode a state encoded by pack_state."""
+    a = array('h')
+    a.fromstring(s)
+    return tuple(tuple(a[i:i + 5]) for i in xrange(0, len(a), 5))
+
+def soln_string (inputs):
+    """Create a solution string from per-frame input.
+
+soln_string(inputs) -> solution
+
+inputs: a sequence of the directions input on each frame, starting with the
+        first frame the puzzle is stepped.
+
+solution: the solution in the format taken by level.Level.
+
+"""
+    moves = [(frame + 1, dirns) for frame, dirns in enumerate(inputs) if dirns]
+    return _moves_soln(moves, [(w, w) for w in _moves_waits(moves)])
+
+def _moves_waits (moves):
+    """Get the waits for a list of (frame, directions) moves."""
+    # Level.solve acts on a first wait of n on frame max(n, 1), and on any later
+    # wait of n on the n + 1th frame after the previous move
+    waits = []
+    last = 0
+    for frame, dirns in moves:
+        waits.append(frame - last - (1 if waits else 0))
+        last = frame
+    return waits
+
+def _moves_soln (moves, ranges):
+    """Create a solution string from moves and (min, max) ranges for waits.
+
+A range may be None to leave the wait out, so that the default is used.
+
+"""
+    if not moves:
+        return '0'
+    soln = []
+    for (frame, dirns), r in zip(moves, ranges):
+        if r is None:
+            soln.append('')
+        elif r[0] == r[1]:
+            soln.append(str(r[0]))
+        else:
+            lo, hi = r
+            soln.append(('>={0}'.format(lo) if lo else '') +
+                        '<={0}'.format(hi))
+        soln.append(''.join(conf.SOLN_DIRS[d] for d in dirns))
+    return ','.join(soln)
+
+def soln_inputs (parsed):
+    """Get the input a parsed solution gives, as solved by level.Level.
+
+soln_inputs(parsed) -> (inputs, end)
+
+parsed: a solution as returned by level.parse_soln.
+
+inputs: {frame: directions} for frames with input, where frame 1 is the first
+        frame the puzzle is stepped.
+end: the frame on which Level stops solving (checking for winning properly),
+     after which there is no more input.
+
+"""
+    # follow what Level.solve does when called each frame
+    calls = []
+    i = 0
+    n = len(parsed)
+    t = parsed[0][1]
+    while i < n:
+        # skip finished waits
+        while i < n and i % 2 == 0 and t <= 0:
+            i += 1
+        if i == n:
+            break
+        elif i % 2:
+            # move
+            calls.append(parsed[i])
+            i += 1
+            if i < n:
+                t = parsed[i][1]
+        else:
+            # wait, maybe holding some directions
+            t -= 1
+            calls.append(parsed[i][0])
+    # the first two calls are both before the first frame
+    inputs = {}
+    for call, dirns in enumerate(calls):
+        if dirns:
+            inputs.setdefault(max(call, 1), set()).update(dirns)
+    return inputs, max(len(calls), 1)
+
+
+class TranspositionTable (object):
+    """A fixed-size table of values for puzzle states.
+
+    CONSTRUCTOR
+
+TranspositionTable(size)
+
+size: the number of slots in the table.
+
+States are identified by Puzzle.hash.  Each hash has one slot it can be stored
+in, and storing a value replaces whatever was in that slot, so memory use is
+bounded and lookups and stores are O(1).  This means stored values can be lost,
+so the table is only suitable for things that can be recomputed if necessary.
+
+    METHODS
+
+get
+store
+clear
+
+    ATTRIBUTES
+
+size: as given.
+n_stored: the number of occupied slots.
+n_replaced: the number of times a value for a different state was overwritten.
+
+"""
+
+    def __init__ (self, size):
+        self.size = size
+        self.clear()
+
+    def __len__ (self):
+        return self.n_stored
+
+    def __contains__ (self, key):
+        return self._keys[key % self.size] == key
+
+    def get (self, key, default = None):
+        """Get the value stored for a state, or default if there is none."""
+        i = key % self.size
+        if self._keys[i] == key:
+            return self._values[i]
+        else:
+            return default
+
+    def store (self, key, value):
+        """Store a value for a state."""
+        i = key % self.size
+        old = self._keys[i]
+        if old is None:
+            self.n_stored += 1
+        elif old != key:
+            self.n_replaced += 1
+        self._keys[i] = key
+        self._values[i] = value
+
+    def clear (self):
+        """Remove all stored values."""
+        self._keys = [None] * self.size
+        self._values = [None] * self.size
+        self.n_stored = 0
+        self.n_replaced = 0
+
+
+class Solver (object):
+    """Find solutions to puzzles by searching over player input.
+
+    CONSTRUCTOR
+
+Solver(defn, time_limit = conf.SOLVER_TIME_LIMIT,
+       max_states = conf.SOLVER_MAX_STATES, table_size = conf.SOLVER_TABLE_SIZE)
+
+defn: the level definition to solve.
+time_limit: maximum time to search for, in seconds, or None for no limit.
+max_states: maximum number of states waiting to be searched, or None for no
+            limit.
+table_size: size of the TranspositionTable used to recognise states that have
+            already been reached.
+
+The search is A*, with the number of frames taken as the cost.  Every frame,
+any one of INPUTS may be given; states are identified by Puzzle.hash.  A
+state is a solution if it is winning and still winning after another frame
+with no input (as required by level.Level).  States where too many standard
+blocks are stuck in corners they can never leave are discarded.
+
+    METHODS
+
+solve
+
+    ATTRIBUTES
+
+puzzle: the puzzle.Puzzle instance used for simulation.
+table: the TranspositionTable used by the last search.
+n_states: the number of states queued by the last search.
+n_expanded: the number of states expanded by the last search.
+
+"""
+
+    def __init__ (self, defn, time_limit = conf.SOLVER_TIME_LIMIT,
+                  max_states = conf.SOLVER_MAX_STATES,
+                  table_size = conf.SOLVER_TABLE_SIZE):
+        self.puzzle = p = Puzzle(None, defn, True, False)
+        self.time_limit = time_limit
+        self.max_states = max_states
+        self.table_size = table_size
+        self.table = None
+        self.n_states = self.n_expanded = 0
+        # goals and tiles that never change
+        self._goals = goals = []
+        fixed = set()
+        for x, col in enumerate(p.grid):
+            for y, (s, b, sel) in enumerate(col):
+                if s >= 0:
+                    goals.append((x, y, s))
+                if b is not None and b.type == conf.B_IMMOVEABLE and \
+                   s != conf.S_SLIDE:
+                    fixed.add((x, y))
+        # tiles standard blocks can never leave and never win on
+        self._dead = dead = set()
+        w, h = p.w, p.h
+        blocked = lambda x, y: (x, y) in fixed or not (0 <= x < w and
+                                                        0 <= y < h)
+        for x, col in enumerate(p.grid):
+            for y, (s, b, sel) in enumerate(col):
+                if s == conf.B_STANDARD or s == conf.S_SLIDE or \
+                   s in conf.S_ARROWS:
+                    continue
+                # forces away from a side can only come from that side
+                stuck_x = any(all(blocked(x + side, y + i) for i in (-1, 0, 1))
+                              for side in (-1, 1))
+                stuck_y = any(all(blocked(x + i, y + side) for i in (-1, 0, 1))
+                              for side in (-1, 1))
+                if stuck_x and stuck_y:
+                    dead.add((x, y))
+        n_standard = len(p.blocks.of_type(conf.B_STANDARD))
+        n_goals = len([g for g in goals if g[2] == conf.B_STANDARD])
+        self._spare_standard = n_standard - n_goals
+
+    def _heuristic (self, state):
+        """Lower bound on the number of frames to reach the goals.
+
+Blocks move at most one tile per frame, so this is the furthest any goal is from
+the nearest block of the right type.  Returns None if a goal has no block.
+
+"""
+        by_type = {}
+        for type_ID, x, y, fx, fy in state:
+            by_type.setdefault(type_ID, []).append((x, y))
+        h = 0
+        for gx, gy, type_ID in self._goals:
+            try:
+                bs = by_type[type_ID]
+            except KeyError:
+                return None
+            h = max(h, min(max(abs(x - gx), abs(y - gy)) for x, y in bs))
+        return h
+
+    def _is_dead (self, state):
+        """Check whether a state can't lead to a solution."""
+        dead = self._dead
+        n = len([1 for type_ID, x, y, fx, fy in state
+                 if type_ID == conf.B_STANDARD and (x, y) in dead])
+        return n > self._spare_standard
+
+    def _wins (self):
+        """Check whether the puzzle's current state is winning."""
+        grid = self.puzzle.grid
+        for x, y, type_ID in self._goals:
+            b = grid[x][y][1]
+            if not isinstance(b, Block) or b.type != type_ID:
+                return False
+        return True
+
+    def _step (self, state, dirns):
+        """Step the puzzle forwards a frame from a state with the given input.
+
+Returns the new Puzzle.hash, or None if the frame's forces couldn't be resolved
+(see Puzzle.step), in which case the puzzle's state is meaningless.
+
+"""
+        p = self.puzzle
+        p.set_state(state)
+        if dirns:
+            for b in p.blocks.of_type(conf.B_PLAYER):
+                for d in dirns:
+                    b.add_force(d, conf.FORCE_MOVE)
+        try:
+            p.step(True)
+        except StepLimitError:
+            return None
+        return p.hash
+
+    def solve (self):
+        """Search for a solution.
+
+Returns the solution as a string in the format taken by level.Level, or None if
+the puzzle can't be solved, or no solution was found within the limits.
+
+"""
+        t0 = time()
+        time_limit = self.time_limit
+        max_states = self.max_states
+        p = self.puzzle
+        if p.blocks.of_type(conf.B_PLAYER):
+            inputs = INPUTS
+        else:
+            inputs = INPUTS[:1]
+        start = p.get_state()
+        h = self._heuristic(start)
+        if h is None:
+            return None
+        # best known number of frames to reach each state
+        self.table = table = TranspositionTable(self.table_size)
+        table.store(p.hash, 0)
+        # node: (state, hash, frames, parent node, input)
+        queue = [(h, 0, 0, (start, p.hash, 0, None, None))]
+        self.n_states = 1
+        self.n_expanded = 0
+        try:
+            while queue:
+                node = heappop(queue)[-1]
+                state, key, g, parent, dirns = node
+                if table.get(key, g) < g:
+                    # already found a better route here
+                    continue
+                self.n_expanded += 1
+                # check limits
+                if time_limit is not None and self.n_expanded % 100 == 0 and \
+                   time() - t0 > time_limit:
+                    return None
+                # check for a solution: must still be winning after a frame
+                p.set_state(state)
+                if self._wins():
+                    if self._step(state, ()) is not None and self._wins():
+                        return self._path(node)
+                g += 1
+                for dirns in inputs:
+                    key = self._step(state, dirns)
+                    if key is None or table.get(key, g + 1) <= g:
+                        # already reached in as few frames
+                        continue
+                    new = p.get_state()
+                    if self._is_dead(new):
+                        continue
+                    table.store(key, g)
+                    if max_states is not None and len(queue) >= max_states:
+                        return None
+                    self.n_states += 1
+                    # prefer deeper states on ties
+                    heappush(queue, (g + self._heuristic(new), -g,
+                                     self.n_states, (new, key, g, node, dirns)))
+            # exhausted all states
+            return None
+        finally:
+            p.reset()
+
+    def _path (self, node):
+        """Construct a solution string for reaching a search node."""
+        inputs = []
+        state, key, g, parent, dirns = node
+        while parent is not None:
+            inputs.append(dirns)
+            state, key, g, parent, dirns = parent
+        inputs.reverse()
+        return soln_string(inputs)
+
+
+def _parallel_worker (i, defn, inboxes, results, work, n_states):
+    """Worker process for ParallelSolver.
+
+_parallel_worker(i, defn, inboxes, results, work, n_states)
+
+i: this worker's index; it owns states with a hash h where
+   h % len(inboxes) == i.
+defn: the level definition being solved.
+inboxes: a Queue for each worker, to receive messages on.
+results: the Queue to send messages to the controlling process on.
+work: a shared count of batches sent but not yet received, plus workers that
+      have states to expand; the search is over once this reaches 0.
+n_states: a shared count of the distinct states found by all workers.
+
+Messages received are ('states', batch), ('bound', frames), ('stats',),
+('parent', hash) and ('quit',).  Messages sent to the controlling process are
+('done',) when the search is over, ('stats', i, n_expanded, busy, found) and
+('parent', i, (parent hash, input index)), where found is (frames, hash) for
+the best solution this worker found, or None.
+
+"""
+    n = len(inboxes)
+    inbox = inboxes[i]
+    solver = Solver(defn, None, None, 1)
+    p = solver.puzzle
+    if p.blocks.of_type(conf.B_PLAYER):
+        inputs = INPUTS
+    else:
+        inputs = INPUTS[:1]
+    # hash: (frames, parent hash, input index)
+    visited = {}
+    # (frames + heuristic, -frames, hash, packed state)
+    queue = []
+    # whether this worker is included in work: only the start state's owner is
+    # to begin with
+    counted = p.hash % n == i
+    n_new = 0
+    if counted:
+        start = p.get_state()
+        h = solver._heuristic(start)
+        if h is not None:
+            visited[p.hash] = (0, None, None)
+            queue.append((h, 0, p.hash, pack_state(start)))
+            n_new += 1
+    # frames taken by the best solution anyone has found, and our best one
+    bound = None
+    found = None
+    batches = [[] for j in xrange(n)]
+    n_expanded = 0
+    busy = 0
+
+    def flush ():
+        # send new states to their owners; the count for a batch must go up
+        # before it's sent, so work can't reach 0 while it's on the way
+        for j, batch in enumerate(batches):
+            if batch:
+                with work.get_lock():
+                    work.value += 1
+                inboxes[j].put(('states', batch))
+                batches[j] = []
+        if n_new:
+            with n_states.get_lock():
+                n_states.value += n_new
+
+    while True:
+        if queue:
+            try:
+                msg = inbox.get_nowait()
+            except Empty:
+                msg = None
+        else:
+            # out of states: pass on what we found and wait for more
+            flush()
+            n_new = 0
+            if counted:
+                counted = False
+                with work.get_lock():
+                    work.value -= 1
+                    done = work.value == 0
+                if done:
+                    results.put(('done',))
+            msg = inbox.get()
+        t0 = time()
+        if msg is None:
+            # expand some states, best first
+            for x in xrange(conf.SOLVER_BATCH_SIZE):
+                if not queue:
+                    break
+                f, g, key, state = heappop(queue)
+                g = -g
+                if visited[key][0] < g or (bound is not None and f >= bound):
+                    # already found a better route here, or can't do better
+                    # than a solution we know about
+                    continue
+                n_expanded += 1
+                state = unpack_state(state)
+                # check for a solution: must still be winning after a frame
+                p.set_state(state)
+                if solver._wins():
+                    if solver._step(state, ()) is not None and solver._wins():
+                        bound = g
+                        found = (g, key)
+                        for j, other in enumerate(inboxes):
+                            if j != i:
+                                other.put(('bound', g))
+                        continue
+                g += 1
+                for d, dirns in enumerate(inputs):
+                    new_key = solver._step(state, dirns)
+                    if new_key is None:
+                        continue
+                    owner = new_key % n
+                    if owner == i:
+                        old = visited.get(new_key)
+                        if old is not None and old[0] <= g:
+                            # already reached in as few frames
+                            continue
+                    new = p.get_state()
+                    if solver._is_dead(new):
+                        continue
+                    f = g + solver._heuristic(new)
+                    if bound is not None and f >= bound:
+                        continue
+                    if owner == i:
+                        if old is None:
+                            n_new += 1
+                        visited[new_key] = (g, key, d)
+                        heappush(queue, (f, -g, new_key, pack_state(new)))
+                    else:
+                        batches[owner].append((new_key, g, f, key, d,
+                                               pack_state(new)))
+            flush()
+            n_new = 0
+        elif msg[0] == 'states':
+            # this batch is no longer on the way; if we weren't counted, we
+            # take its place
+            if counted:
+                with work.get_lock():
+                    work.value -= 1
+            counted = True
+            for key, g, f, parent, d, state in msg[1]:
+                if bound is not None and f >= bound:
+                    continue
+                old = visited.get(key)
+                if old is None:
+                    n_new += 1
+                elif old[0] <= g:
+                    continue
+                visited[key] = (g, parent, d)
+                heappush(queue, (f, -g, key, state))
+        elif msg[0] == 'bound':
+            if bound is None or msg[1] < bound:
+                bound = msg[1]
+        elif msg[0] == 'stats':
+            results.put(('stats', i, n_expanded, busy, found))
+        elif msg[0] == 'parent':
+            results.put(('parent', i, visited[msg[1]][1:]))
+        else: # quit
+            break
+        busy += time() - t0
+
+
+class ParallelSolver (object):
+    """Find solutions to puzzles using multiple processes.
+
+    CONSTRUCTOR
+
+ParallelSolver(defn, n_workers = multiprocessing.cpu_count(),
+               time_limit = conf.SOLVER_TIME_LIMIT,
+               max_states = conf.SOLVER_MAX_STATES)
+
+defn: the level definition to solve.
+n_workers: the number of worker processes to use.
+time_limit: maximum time to search for, in seconds, or None for no limit.
+max_states: maximum number of distinct states to store in total, or None for no
+            limit.
+
+The search is A*, with the same inputs, cost, heuristic, winning conditions and
+pruning as Solver, split between workers.  Each state is owned by one worker,
+chosen by its Puzzle.hash, which keeps the best known number of frames to reach
+the states it owns and expands them best first.  Workers never wait for each
+other: new states are sent to their owners as packed states (see pack_state) in
+one batch per worker after every conf.SOLVER_BATCH_SIZE states expanded.  A
+worker that finds a solution tells the others how many frames it takes, and
+states that can't lead to a faster one are dropped.  The search is over when no
+worker has any states left and no batches are on the way, which is tracked with
+a shared count; so the solution found takes the fewest possible frames.
+
+    METHODS
+
+solve
+
+    ATTRIBUTES
+
+n_workers: as given.
+n_states: the number of distinct states found by the last search.
+worker_stats: a list of (states expanded, states expanded per second) for
+              each worker in the last search, or an empty list if it hit a
+              limit.
+
+"""
+
+    def __init__ (self, defn, n_workers = None,
+                  time_limit = conf.SOLVER_TIME_LIMIT,
+                  max_states = conf.SOLVER_MAX_STATES):
+        self.defn = defn
+        if n_workers is None:
+            n_workers = cpu_count()
+        self.n_workers = n_workers
+        self.time_limit = time_limit
+        self.max_states = max_states
+        self.n_states = 0
+        self.worker_stats = []
+
+    def solve (self):
+        """Search for a solution.
+
+Returns the solution as a string in the format taken by level.Level, or None if
+the puzzle can't be solved, or no solution was found within the limits.
+
+"""
+        t0 = time()
+        n = self.n_workers
+        inboxes = [Queue() for i in xrange(n)]
+        results = Queue()
+        work = Value('l', 1)
+        n_states = Value('l', 0)
+        workers = [Process(target = _parallel_worker,
+                           args = (i, self.defn, inboxes, results, work,
+                                   n_states))
+                   for i in xrange(n)]
+        for w in workers:
+            w.daemon = True
+            w.start()
+        soln = None
+        self.worker_stats = []
+        try:
+            if not self._wait(results, n_states, t0):
+                # hit a limit; workers might never finish what they're doing,
+                # so just stop them
+                return None
+            # collect statistics and the best solution
+            for inbox in inboxes:
+                inbox.put(('stats',))
+            stats = [None] * n
+            best = None
+            for w in workers:
+                msg, i, n_expanded, busy, found = results.get()
+                stats[i] = (n_expanded, n_expanded / busy if busy else 0)
+                if found is not None and (best is None or found < best):
+                    best = found
+            self.n_states = n_states.value
+            if best is not None:
+                soln = self._path(best[1], inboxes, results)
+            for inbox in inboxes:
+                inbox.put(('quit',))
+            for w in workers:
+                w.join()
+            self.worker_stats = stats
+        finally:
+            for w in workers:
+                if w.is_alive():
+                    w.terminate()
+                    w.join()
+            if not conf.SILENT:
+                for i, (n_expanded, rate) in enumerate(self.worker_stats):
+                    print 'worker {0}: {1} states, {2:.0f}/s'.format(
+                        i, n_expanded, rate
+                    )
+        return soln
+
+    def _wait (self, results, n_states, t0):
+        """Wait for the workers to finish searching.
+
+_wait(results, n_states, t0) -> finished
+
+results: the Queue the workers send messages on.
+n_states: the shared count of distinct states found.
+t0: the time the search started.
+
+finished: whether the search finished before hitting a limit.
+
+"""
+        time_limit = self.time_limit
+        max_states = self.max_states
+        if time_limit is None and max_states is None:
+            results.get()
+            return True
+        while True:
+            # check the limits every so often
+            timeout = 0.1
+            if time_limit is not None:
+                timeout = min(timeout, max(t0 + time_limit - time(), 0))
+            try:
+                results.get(True, timeout)
+                return True
+            except Empty:
+                pass
+            self.n_states = n_states.value
+            if (time_limit is not None and time() - t0 > time_limit) or \
+               (max_states is not None and self.n_states > max_states):
+                return False
+
+    def _path (self, key, inboxes, results):
+        """Construct a solution string for reaching a state."""
+        n = self.n_workers
+        inputs = []
+        while True:
+            inboxes[key % n].put(('parent', key))
+            key, d = results.get()[2]
+            if key is None:
+                break
+            inputs.append(INPUTS[d])
+        inputs.reverse()
+        return soln_string(inputs)
+
+
+def _waits_moves (waits, moves):
+    """Get moves with the given waits (the reverse of _moves_waits)."""
+    new = []
+    call = -1
+    for w, (old_frame, dirns) in zip(waits, moves):
+        # see soln_inputs
+        call += w + 1
+        frame = max(call, 1)
+        if new and new[-1][0] == frame:
+            new[-1] = (frame, tuple(sorted(set(new[-1][1] + dirns))))
+        else:
+            new.append((frame, dirns))
+    return new
+
+def _first_difference (moves1, moves2):
+    """Get the first frame on which two lists of moves differ, or None."""
+    for m1, m2 in zip(moves1, moves2):
+        if m1 != m2:
+            return min(m1[0], m2[0])
+    n1 = len(moves1)
+    n2 = len(moves2)
+    if n1 > n2:
+        return moves1[n2][0]
+    elif n2 > n1:
+        return moves2[n1][0]
+    else:
+        return None
+
+
+class Minimiser (object):
+    """Shorten solutions to a level.
+
+    CONSTRUCTOR
+
+Minimiser(defn)
+
+defn: the level definition.
+
+Solutions are checked by simulating the puzzle with the input level.Level gives
+it when solving, and the same winning conditions and waiting afterwards as used
+to check the solutions of shared levels.  Simulation restarts from stored states
+at the first frame where a solution differs from the last one that worked.  A
+solution doesn't work if any frame hits the limit on resolving forces (see
+Puzzle.step).
+
+    METHODS
+
+check
+minimise
+bound
+
+    ATTRIBUTES
+
+puzzle: the puzzle.Puzzle instance used for simulation.
+n_checks: the number of solutions simulated.
+
+"""
+
+    def __init__ (self, defn):
+        self._solver = Solver(defn, None, None, 1)
+        self.puzzle = self._solver.puzzle
+        self._start = self.puzzle.get_state()
+        self.n_checks = 0
+        # last moves that worked and the states after each frame for them
+        self._moves = None
+        self._snapshots = None
+
+    def _run (self, moves, record = False):
+        """Simulate solving with the given moves.
+
+_run(moves, record = False) -> won
+
+moves: list of (frame, directions), sorted by frame.
+record: whether to store these moves and states for them to resume from in
+        future simulations.  This is ignored if the moves don't win.
+
+"""
+        self.n_checks += 1
+        p = self.puzzle
+        inputs = dict(moves)
+        end = moves[-1][0] + 1 if moves else 1
+        # start from the last frame we know will be the same
+        frame = 0
+        if self._moves is not None:
+            diff = _first_difference(moves, self._moves)
+            frame = len(self._snapshots) - 1
+            if diff is not None:
+                frame = min(frame, diff - 1, end - 1)
+        if frame:
+            state, winning = self._snapshots[frame]
+            snapshots = self._snapshots[:frame + 1]
+        else:
+            state, winning = self._start, False
+            snapshots = [(state, winning)]
+        p.set_state(state)
+        players = p.blocks.of_type(conf.B_PLAYER)
+        won = False
+        while True:
+            frame += 1
+            for d in inputs.get(frame, ()):
+                for b in players:
+                    b.add_force(d, conf.FORCE_MOVE)
+            try:
+                changed = p.step(True)
+            except StepLimitError:
+                break
+            # need to win on two frames in a row, once finished solving
+            if self._solver._wins():
+                if winning and frame >= end:
+                    won = True
+                    break
+                winning = True
+            else:
+                winning = False
+            if frame < end:
+                snapshots.append((p.get_state(), winning))
+            elif frame > end and (not changed or
+                                  frame - end >= conf.POST_SOLVE_WAIT):
+                # Level stops when nothing changes
+                break
+        if won and record:
+            self._moves = moves
+            self._snapshots = snapshots
+        return won
+
+    def check (self, soln, speed = conf.SOLVE_SPEED):
+        """Check whether a solution works.
+
+check(soln, speed = conf.SOLVE_SPEED) -> works
+
+speed: as taken by level.parse_soln: conf.SOLVE_SPEED for normal speed, or 0
+       for fast-forwarding.
+
+"""
+        from level import parse_soln
+        inputs, end = soln_inputs(parse_soln(soln, speed))
+        return self._run(sorted((frame, tuple(sorted(dirns)))
+                                for frame, dirns in inputs.iteritems()))
+
+    def _try (self, moves):
+        """Keep the given moves if they work."""
+        return self._run(moves, True)
+
+    def minimise (self, soln):
+        """Shorten a solution.
+
+Moves are removed, turned from diagonals into single directions, and made
+earlier, and pairs of moves on consecutive frames are merged into diagonals,
+for as long as the solution keeps working.  The shortened solution is written
+with exact waits, except that waits of conf.SOLVE_SPEED are left out where the
+solution also works with them fast-forwarded, and also with other waits
+changed to conf.SOLVE_SPEED and left out where it still works.  Returns the
+shortest of these and the given solution (preferring fewer frames on ties), or
+None if the given solution doesn't work.
+
+"""
+        from level import parse_soln
+        if not self.check(soln):
+            return None
+        inputs, end = soln_inputs(parse_soln(soln))
+        moves = sorted((frame, tuple(sorted(dirns)))
+                       for frame, dirns in inputs.iteritems())
+        self._moves = None
+        self._try(moves)
+        changed = True
+        while changed:
+            changed = False
+            for method in (self._delete, self._simplify, self._merge,
+                           self._hurry):
+                # go backwards so changes don't affect moves still to try
+                j = len(self._moves) - 1
+                while j >= 0:
+                    if method(j):
+                        changed = True
+                    j = min(j, len(self._moves)) - 1
+        # stretching waits takes more frames, so it's only worth it if it makes
+        # the solution shorter
+        options = [self._soln(self._moves), self._soln(self._moves, True),
+                   soln]
+        return min(options, key = len)
+
+    def _soln (self, moves, stretch = False):
+        """Write working moves as a solution with as many default waits as
+possible.
+
+_soln(moves, stretch = False) -> solution
+
+stretch: whether to also try changing waits to conf.SOLVE_SPEED so they can be
+         left out.
+
+"""
+        waits = _moves_waits(moves)
+        ranges = [(w, w) for w in waits]
+        # left out waits are 0 when fast-forwarding
+        for j in xrange(len(ranges) - 1, -1, -1):
+            new_waits, new_moves = waits, moves
+            if waits[j] != conf.SOLVE_SPEED:
+                if not stretch:
+                    continue
+                new_waits = waits[:j] + [conf.SOLVE_SPEED] + waits[j + 1:]
+                new_moves = _waits_moves(new_waits, moves)
+                if not self._run(new_moves):
+                    continue
+            old = ranges[j]
+            ranges[j] = None
+            if self.check(_moves_soln(new_moves, ranges), 0):
+                waits, moves = new_waits, new_moves
+            else:
+                ranges[j] = old
+        return _moves_soln(moves, ranges)
+
+    def _delete (self, j):
+        """Try removing a move."""
+        moves = self._moves
+        return self._try(moves[:j] + moves[j + 1:])
+
+    def _simplify (self, j):
+        """Try replacing a diagonal move with a single direction."""
+        moves = self._moves
+        frame, dirns = moves[j]
+        if len(dirns) > 1:
+            for d in dirns:
+                if self._try(moves[:j] + [(frame, (d,))] + moves[j + 1:]):
+                    return True
+        return False
+
+    def _merge (self, j):
+        """Try combining a move and the next into a diagonal."""
+        moves = self._moves
+        if j + 1 >= len(moves):
+            return False
+        (f1, d1), (f2, d2) = moves[j:j + 2]
+        if f2 != f1 + 1 or len(d1) != 1 or len(d2) != 1 or \
+           d1[0] % 2 == d2[0] % 2:
+            # not consecutive single moves on different axes
+            return False
+        merged = (f1, tuple(sorted(d1 + d2)))
+        rest = moves[j + 2:]
+        # try keeping later moves at the same time relative to this one first
+        for shift in (1, 0):
+            later = [(frame - shift, dirns) for frame, dirns in rest]
+            if self._try(moves[:j] + [merged] + later):
+                return True
+        return False
+
+    def _hurry (self, j):
+        """Try making a move and all later moves earlier."""
+        moves = self._moves
+        prev = moves[j - 1][0] if j else 0
+        gap = moves[j][0] - prev - 1
+        # try the biggest change first
+        while gap > 0:
+            later = [(frame - gap, dirns) for frame, dirns in moves[j:]]
+            if self._try(moves[:j] + later):
+                return True
+            gap /= 2
+        return False
+
+    def bound (self, soln):
+        """Find the range of values each wait in a solution can take.
+
+Each wait's range is the values that work with all other waits kept the same,
+up to conf.MINIMISER_MAX_SLACK frames longer than given.  When solving, the
+normal speed is used where it's in range, and the lowest value when
+fast-forwarding; any ranges that don't work together like this are narrowed to
+the given value.  Returns the solution with ranges, or None if the given
+solution doesn't work.
+
+"""
+        from level import parse_soln
+        if not self.check(soln):
+            return None
+        inputs, end = soln_inputs(parse_soln(soln))
+        moves = sorted((frame, tuple(sorted(dirns)))
+                       for frame, dirns in inputs.iteritems())
+        self._moves = None
+        self._try(moves)
+        waits = _moves_waits(moves)
+        ranges = []
+        for j, w in enumerate(waits):
+            bounds = []
+            for step, limit in ((-1, -1), (1, w + conf.MINIMISER_MAX_SLACK + 1)):
+                v = w
+                while v + step != limit:
+                    new = waits[:j] + [v + step] + waits[j + 1:]
+                    if not self._run(_waits_moves(new, moves)):
+                        break
+                    v += step
+                bounds.append(v)
+            ranges.append(tuple(bounds))
+        # check the waits that will actually get used
+        clamp = lambda x, (lo, hi): min(max(x, lo), hi)
+        for j in xrange(len(ranges), -1, -1):
+            if j < len(ranges):
+                ranges[j] = (waits[j], waits[j])
+            if all(self._run(_waits_moves([clamp(speed, r) for r in ranges],
+                                          moves))
+                   for speed in (conf.SOLVE_SPEED, 0)):
+                break
+        return _moves_soln(moves, ranges)
@@ -0,0 +1,227 @@
+"""Brain Requirement Just A Formality.  Copyright 2011 by J.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+
+"""
+
+import os
+from hashlib import sha1
+from threading import Thread, Lock
+from Queue import Queue
+
+import pygame
+
+from puzzle import Puzzle
+import conf
+
+def _path (defn, size):
+    """Get the cache file for a thumbnail of a puzzle definition."""
+    data = '{0}\n{1} {2}\n{3}'.format(conf.THEME, size[0], size[1], defn)
+    return conf.THUMBNAIL_DIR + sha1(data).hexdigest() + '.png'
+
+def _save (img, fn):
+    """Save a thumbnail to the cache."""
+    d = os.path.dirname(fn)
+    if d and not os.path.exists(d):
+        os.makedirs(d)
+    # pygame picks the format from the extension
+    tmp = fn[:-4] + '-tmp.png'
+    pygame.image.save(img, tmp)
+    try:
+        os.rename(tmp, fn)
+    except OSError:
+        # Windows won't replace an existing file
+        os.remove(fn)
+        os.rename(tmp, fn)
+
+
+class _Images (object):
+    """Stands in for the Game when drawing a puzzle off-screen.
+
+Only provides Game.img for image files, without converting images for the
+display, and always waits for images to be scaled.
+
+"""
+
+    def __init__ (self):
+        self._cache = {}
+
+    def img (self, data, size, wait = True):
+        if len(size) == 4:
+            # rect
+            size = size[2:]
+        key = (data, tuple(size))
+        if key not in self._cache:
+            img = pygame.image.load(data)
+            try:
+                img = pygame.transform.smoothscale(img, key[1])
+            except ValueError:
+                # smoothscale only handles 24- and 32-bit images
+                img = pygame.transform.scale(img, key[1])
+            self._cache[key] = img
+        return self._cache[key]
+
+
+def _puzzle (defn, imgs):
+    """Create a puzzle for render."""
+    return Puzzle(imgs, defn, seed = 0, mode = 'fit')
+
+def _draw (p, size = None):
+    """Draw a puzzle created by _puzzle, as for render."""
+    if size is None:
+        size = conf.THUMBNAIL_SIZE
+    surface = pygame.Surface(size, 0, 32)
+    rect = p.draw(surface, True)[0]
+    return surface.subsurface(rect).copy()
+
+def render (defn, size = None, imgs = None):
+    """Draw a puzzle's initial state off-screen.
+
+render(defn[, size][, imgs]) -> surface
+
+defn: puzzle or level definition.
+size: (width, height) to fit the puzzle in; defaults to conf.THUMBNAIL_SIZE.
+imgs: _Images instance to load tile images with, to reuse them between calls.
+
+surface: the drawn puzzle, just big enough to hold it.
+
+This does not use the display, so can be called from any thread.
+
+"""
+    if imgs is None:
+        imgs = _Images()
+    return _draw(_puzzle(defn, imgs), size)
+
+
+class Thumbnails (object):
+    """Level thumbnails, drawn in a pool of background threads.
+
+Thumbnails(n_workers = conf.THUMBNAIL_WORKERS)
+
+n_workers: the number of threads to load and draw thumbnails in.
+
+A thumbnail is a level's initial state, drawn by render with the default size.
+Thumbnails are saved as PNG images in conf.THUMBNAIL_DIR, keyed by a hash of
+the puzzle definition, the theme and the size, so a level is only ever drawn
+again if it changes.  Everything from reading the level file onwards, including
+loading cached images, is done by the workers: Thumbnails.get only looks up
+thumbnails that are ready.
+
+    METHODS
+
+request
+get
+clear
+stop
+
+    ATTRIBUTES
+
+n_workers: as given.
+
+"""
+
+    def __init__ (self, n_workers = None):
+        if n_workers is None:
+            n_workers = conf.THUMBNAIL_WORKERS
+        self.n_workers = n_workers
+        # {fn: thumbnail}, where thumbnail is None if it couldn't be made
+        self._thumbs = {}
+        self._requested = set()
+        # requests are (generation, fn); Thumbnails.clear moves to a new
+        # generation so that workers drop old requests and results, and a None
+        # request stops a worker
+        self._generation = 0
+        self._lock = Lock()
+        self._queue = Queue()
+        for i in xrange(max(n_workers, 1)):
+            t = Thread(target = self._work)
+            t.daemon = True
+            t.start()
+
+    def _make (self, fn, imgs):
+        """Load a thumbnail from the cache, or draw and cache it."""
+        with open(fn) as f:
+            defn = f.read()
+        size = conf.THUMBNAIL_SIZE
+        p = _puzzle(defn, imgs)
+        cache_fn = _path(p.definition(), size)
+        try:
+            return pygame.image.load(cache_fn)
+        except pygame.error:
+            # not cached
+            pass
+        img = _draw(p, size)
+        try:
+            _save(img, cache_fn)
+        except (IOError, OSError, pygame.error):
+            # only a cache
+            pass
+        return img
+
+    def _work (self):
+        imgs = _Images()
+        while True:
+            request = self._queue.get()
+            if request is None:
+                break
+            generation, fn = request
+            if generation != self._generation:
+                continue
+            try:
+                img = self._make(fn, imgs)
+            except Exception:
+                # missing or broken level: any error, so the worker keeps
+                # serving requests
+                img = None
+            with self._lock:
+                if generation == self._generation:
+                    self._thumbs[fn] = img
+
+    def request (self, *fns):
+        """Have thumbnails made for the given level files, in order.
+
+Levels that have already been requested are ignored.
+
+"""
+        for fn in fns:
+            if fn not in self._requested:
+                self._requested.add(fn)
+                self._queue.put((self._generation, fn))
+
+    def get (self, fn):
+        """Get the thumbnail for a level file.
+
+Returns a surface, or None if it's not ready yet (in which case it is
+requested) or the level couldn't be loaded.
+
+"""
+        try:
+            return self._thumbs[fn]
+        except KeyError:
+            self.request(fn)
+            return None
+
+    def clear (self):
+        """Forget all thumbnails and requests, for when levels have changed.
+
+Images cached on disk are kept, since they are only used for an unchanged
+level.
+
+"""
+        with self._lock:
+            self._generation += 1
+            self._thumbs = {}
+            self._requested = set()
+
+    def stop (self):
+        """Stop the worker threads once they finish what they're doing.
+
+Requests made afterwards are never served.
+
+"""
+        self.clear()
+        for i in xrange(max(self.n_workers, 1)):
+            self._queue.put(None)
@@ -0,0 +1,231 @@
+"""Brain Requirement Just A Formality.  Copyright 2011 by J.
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+
+"""
+
+import os
+import json
+from hashlib import sha1
+from threading import Thread, Lock
+from time import sleep
+from itertools import count
+
+import pygame
+
+from puzzle import ENGINE_VERSION
+import level
+import conf
+
+# {key: works} and keys in least recently used order; loaded when needed
+_cache = None
+_order = []
+# held while using the cache, since Verifier threads might run at once
+_lock = Lock()
+_verifier_IDs = count()
+
+def _key (defn, soln):
+    """Get the cache key for a solution to a level."""
+    data = '{0}\n{1}\n{2}'.format(ENGINE_VERSION, defn, soln)
+    return sha1(data).hexdigest()
+
+def _load ():
+    """Load the cache from disk if not already loaded."""
+    global _cache, _order
+    if _cache is not None:
+        return
+    try:
+        with open(conf.VERIFY_CACHE_FILE) as f:
+            entries = json.load(f)
+        _order = [str(k) for k, works in entries]
+        _cache = dict((str(k), bool(works)) for k, works in entries)
+    except (IOError, ValueError, TypeError):
+        # missing or broken: start again
+        _order = []
+        _cache = {}
+
+def _save ():
+    """Save the cache to disk."""
+    fn = conf.VERIFY_CACHE_FILE
+    d = os.path.dirname(fn)
+    if d and not os.path.exists(d):
+        os.makedirs(d)
+    tmp = fn + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump([(k, _cache[k]) for k in _order], f)
+    try:
+        os.rename(tmp, fn)
+    except OSError:
+        # Windows won't replace an existing file
+        os.remove(fn)
+        os.rename(tmp, fn)
+
+def _use (key, works = None):
+    """Mark a cache entry as recently used, adding it if works is given."""
+    if works is not None:
+        _cache[key] = works
+    # another thread might have added it while we were checking it
+    if key in _order:
+        _order.remove(key)
+    _order.append(key)
+    # evict least recently used
+    excess = len(_order) - max(conf.VERIFY_CACHE_SIZE, 0)
+    if excess > 0:
+        for k in _order[:excess]:
+            del _cache[k]
+        del _order[:excess]
+
+def solution_works (lvl, i, step = None):
+    """Run a solution on a level and see if it wins.
+
+solution_works(lvl, i[, step]) -> works
+
+lvl: Level instance; it is reset afterwards.
+i: index of the solution in lvl.solutions.
+step: a function called with no arguments after every frame; if it returns
+      True, the solution is abandoned and works is None.
+
+This does not use the cache.  A solution that cannot be parsed doesn't work.
+
+"""
+    try:
+        level.parse_soln(lvl.solutions[i])
+    except ValueError:
+        return False
+    lvl.solve(i)
+    n = conf.POST_SOLVE_WAIT
+    while lvl.solving or (n and lvl.update()):
+        if lvl.solving:
+            lvl.update()
+        else:
+            n -= 1
+        if step is not None and step():
+            return None
+    works = lvl.won
+    lvl.reset()
+    return works
+
+def verify (defn, step = None, progress = None):
+    """Check which solutions in a level definition work.
+
+verify(defn[, step][, progress]) -> (lvl, results)
+
+defn: level definition, including any messages and solutions.
+step: as taken by solution_works; if checking is abandoned, the return value is
+      None.
+progress: a function called with (done, total) before checking each solution
+          and once all are checked, where done is the number of solutions
+          checked and total is the number of solutions.
+
+lvl: a Level instance with defn loaded.
+results: a list of bools, one for each solution in lvl.solutions, indicating
+         whether the solution wins the level.  If the level starts out
+         winning, no solutions are considered to work.
+
+Results are remembered between runs, keyed by a hash of the level, the solution
+and puzzle.ENGINE_VERSION, so checking a known level again is quick.
+
+"""
+    lvl = level.Level(definition = defn, sound = False)
+    total = len(lvl.solutions)
+    if level.defn_wins(defn):
+        results = [False] * total
+    else:
+        puzzle_defn = lvl.puzzle.definition()
+        results = []
+        changed = False
+        for i, soln in enumerate(lvl.solutions):
+            if progress is not None:
+                progress(i, total)
+            key = _key(puzzle_defn, soln)
+            with _lock:
+                _load()
+                works = _cache.get(key)
+                if works is not None:
+                    _use(key)
+            if works is None:
+                works = solution_works(lvl, i, step)
+                if works is None:
+                    # abandoned
+                    return None
+                with _lock:
+                    _use(key, works)
+                changed = True
+            results.append(works)
+        if changed:
+            with _lock:
+                try:
+                    _save()
+                except (IOError, OSError):
+                    # only a cache
+                    pass
+    if progress is not None:
+        progress(total, total)
+    return (lvl, results)
+
+
+class Verifier (Thread):
+    """Run verify in a background thread.  Inherits from threading.Thread.
+
+Verifier(defn[, event])
+
+defn: level definition, as taken by verify.
+event: pygame event type to post when finished, with an ID attribute set to the
+       Verifier's ID; if not given, no event is posted.
+
+The thread is started on creation, and yields often to other threads so that
+the game keeps running smoothly.
+
+    METHODS
+
+cancel
+
+    ATTRIBUTES
+
+defn, event: as given.
+ID: a number unique to this Verifier.
+done: the number of solutions checked so far.
+total: the number of solutions to check, or None if not yet known.
+result: the return value of verify once finished, else None.
+finished: whether verification has finished (stays False if cancelled).
+cancelled: whether Verifier.cancel has been called.
+
+"""
+
+    def __init__ (self, defn, event = None):
+        Thread.__init__(self)
+        self.daemon = True
+        self.defn = defn
+        self.event = event
+        self.ID = _verifier_IDs.next()
+        self.done = 0
+        self.total = None
+        self.result = None
+        self.finished = False
+        self.cancelled = False
+        self.start()
+
+    def _step (self):
+        # let the main thread in
+        sleep(0)
+        return self.cancelled
+
+    def _progress (self, done, total):
+        self.done = done
+        self.total = total
+
+    def run (self):
+        result = verify(self.defn, self._step, self._progress)
+        if result is None or self.cancelled:
+            return
+        self.result = result
+        self.finished = True
+        if self.event is not None:
+            pygame.event.post(pygame.event.Event(self.event, ID = self.ID))
+
+    def cancel (self):
+        """Stop verifying as soon as possible; no event is posted."""
+        self.cancelled = True